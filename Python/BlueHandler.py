@@ -6,7 +6,9 @@ import dbus.mainloop.glib
 
 import logging
 import json
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 import asyncio
 
@@ -16,63 +18,343 @@ ADAPTER_IFACE = SERVICE_NAME + ".Adapter1"
 DEVICE_IFACE = SERVICE_NAME + ".Device1"
 PLAYER_IFACE = SERVICE_NAME + ".MediaPlayer1"
 TRANSPORT_IFACE = SERVICE_NAME + ".MediaTransport1"
+CONTROL_IFACE = SERVICE_NAME + ".MediaControl1"
 IFACE = "org.freedesktop.DBus"
 MANAGER_IFACE = IFACE + ".ObjectManager"
 PROP_IFACE = IFACE + ".Properties"
+ALREADY_CONNECTED = SERVICE_NAME + ".Error.AlreadyConnected"
+CALL_TIMEOUT = 10  # Seconds to wait for a reply to a dbus call
 
+HISTORY_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "device_history.json"
+)
 
-async def event_setter(connectingEvent):
-    connectingEvent.set()
 
+def dbus_call(loop, method, *args, timeout=CALL_TIMEOUT, **keywords):
+    """Call a dbus method without blocking the loop. Returns a future which is
+    set from the reply, to None, the value or a tuple of values depending on
+    how many there are, or to the DBusException on an error or after timeout
+    seconds without a reply."""
+    future = loop.create_future()
 
-"""Utility functions from bluezutils.py"""
+    def reply(*values):
+        if len(values) < 2:
+            values = values[0] if values else None
+        loop.call_soon_threadsafe(set_future, future, values, None)
 
+    def error(e):
+        loop.call_soon_threadsafe(set_future, future, None, e)
 
-def get_managed_objects():
-    bus = dbus.SystemBus()
-    manager = dbus.Interface(bus.get_object(SERVICE_NAME, "/"), MANAGER_IFACE)
-    return manager.GetManagedObjects()
+    method(*args, reply_handler=reply, error_handler=error, timeout=timeout, **keywords)
+    return future
 
 
-def find_adapter():
-    objects = get_managed_objects()
-    bus = dbus.SystemBus()
-    for path, ifaces in objects.items():
-        adapter = ifaces.get(ADAPTER_IFACE)
-        if adapter is None:
-            continue
-        obj = bus.get_object(SERVICE_NAME, path)
-        return dbus.Interface(obj, ADAPTER_IFACE)
-    raise Exception("Bluetooth adapter not found")
+def set_future(future, result, error):
+    if future.cancelled():
+        return
+    if error is None:
+        future.set_result(result)
+    else:
+        future.set_exception(error)
+
+
+# Track metadata keys the player uses. Others (e.g. Genre, ImgHandle) are skipped.
+TRACK_KEYS = ("Title", "Artist", "Album", "Duration")
+
 
+def decode_array(data):
+    decoders = DBUS_DECODERS
+    decoded = []
+    for value in data:
+        decoder = decoders.get(type(value))
+        decoded.append(value if decoder is None else decoder(value))
+    return decoded
 
-def dbus_decode(data):
+
+def decode_dict(data, keys=None):
+    """Convert a dictionary in one pass. If keys is given, only those keys are
+    kept."""
+    decoders = DBUS_DECODERS
+    decoded = {}
+    for key, value in data.items():
+        if keys is not None and key not in keys:
+            continue
+        decoder = decoders.get(type(value))
+        decoded[str(key)] = value if decoder is None else decoder(value)
+    return decoded
+
+
+# Converter for each dbus type, looked up by exact type
+DBUS_DECODERS = {
+    dbus.String: str,
+    dbus.ObjectPath: str,
+    dbus.Signature: str,
+    dbus.Boolean: bool,
+    dbus.Byte: int,
+    dbus.Int16: int,
+    dbus.UInt16: int,
+    dbus.Int32: int,
+    dbus.UInt32: int,
+    dbus.Int64: int,
+    dbus.UInt64: int,
+    dbus.Double: float,
+    dbus.Array: decode_array,
+    dbus.Struct: decode_array,
+    dbus.Dictionary: decode_dict,
+    list: decode_array,
+    dict: decode_dict,
+}
+
+
+def dbus_decode(data, keys=None):
     """
-        convert dbus data types to python native data types
+        convert dbus data types to python native data types. If keys is given,
+        only those keys of a dictionary are converted and the rest are dropped.
     """
-    if isinstance(data, dbus.String):
-        data = str(data)
-    elif isinstance(data, dbus.Boolean):
-        data = bool(data)
-    elif (
-        isinstance(data, dbus.UInt32)
-        or isinstance(data, dbus.UInt64)
-        or isinstance(data, dbus.UInt16)
-        or isinstance(data, dbus.Int32)
-        or isinstance(data, dbus.Int64)
-        or isinstance(data, dbus.UInt16)
-    ):
-        data = int(data)
-    elif isinstance(data, dbus.Double):
-        data = float(data)
-    elif isinstance(data, dbus.Array):
-        data = [dbus_decode(value) for value in data]
-    elif isinstance(data, dbus.Dictionary):
-        new_data = dict()
-        for key in data.keys():
-            new_data[dbus_decode(key)] = dbus_decode(data[key])
-        data = new_data
-    return data
+    decoder = DBUS_DECODERS.get(type(data))
+    if decoder is None:
+        return data
+    if keys is not None and decoder is decode_dict:
+        return decode_dict(data, keys)
+    return decoder(data)
+
+
+class ObjectTree:
+    """Local mirror of the BlueZ object tree, as {path: {interface: properties}}.
+    Loaded once and then kept current from InterfacesAdded, InterfacesRemoved
+    and PropertiesChanged signals, so lookups don't need a bus round trip.
+    Property values are kept as dbus types."""
+
+    def __init__(self):
+        self.objects = {}
+        # Changes signalled while loading, as (method, args), or None
+        self.queued = None
+
+    async def load(self, loop, manager):
+        """Replace the mirror with the whole object tree from an ObjectManager.
+        Changes signalled while it loads are replayed over it, as they may have
+        arrived after the reply was sent but before it was handled."""
+        self.queued = []
+        try:
+            objects = await dbus_call(loop, manager.GetManagedObjects)
+        finally:
+            queued, self.queued = self.queued, None
+        self.objects = {
+            str(path): {
+                str(interface): dict(properties)
+                for interface, properties in interfaces.items()
+            }
+            for path, interfaces in objects.items()
+        }
+        for method, args in queued:
+            method(*args)
+
+    def interfaces_added(self, path, interfaces):
+        if self.queued is not None:
+            self.queued.append((self.interfaces_added, (path, interfaces)))
+        objectInterfaces = self.objects.setdefault(str(path), {})
+        for interface, properties in interfaces.items():
+            objectInterfaces[str(interface)] = dict(properties)
+
+    def interfaces_removed(self, path, interfaces):
+        if self.queued is not None:
+            self.queued.append((self.interfaces_removed, (path, interfaces)))
+        objectInterfaces = self.objects.get(str(path))
+        if objectInterfaces is None:
+            return
+        for interface in interfaces:
+            objectInterfaces.pop(str(interface), None)
+        if not objectInterfaces:
+            del self.objects[str(path)]
+
+    def properties_changed(self, interface, changed, invalidated, path):
+        if self.queued is not None:
+            self.queued.append(
+                (self.properties_changed, (interface, changed, invalidated, path))
+            )
+        properties = self.objects.get(str(path), {}).get(str(interface))
+        if properties is None:
+            return
+        properties.update(changed)
+        for name in invalidated:
+            properties.pop(name, None)
+
+    def paths(self, interface):
+        """Paths of all objects with an interface"""
+        return [
+            path for path, interfaces in self.objects.items() if interface in interfaces
+        ]
+
+    def properties(self, path, interface):
+        """Properties of an interface of an object, or None if it doesn't exist"""
+        return self.objects.get(str(path), {}).get(interface)
+
+
+class ProxyCache:
+    """dbus proxies by (path, interface), so objects aren't looked up and
+    wrapped again on every call. Without an interface the proxy is the bus
+    object itself, for calls which pass dbus_interface. Entries are dropped
+    when their interfaces are removed from the bus."""
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.proxies = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, interface=None):
+        key = (str(path), interface)
+        proxy = self.proxies.get(key)
+        if proxy is not None:
+            self.hits += 1
+            return proxy
+        self.misses += 1
+        # Following the name owner avoids a blocking call to look it up
+        proxy = self.bus.get_object(SERVICE_NAME, path, follow_name_owner_changes=True)
+        if interface is not None:
+            proxy = dbus.Interface(proxy, interface)
+        self.proxies[key] = proxy
+        return proxy
+
+    def invalidate(self, path, interfaces=None):
+        """Drop the proxies of some interfaces of an object, or all of them"""
+        path = str(path)
+        for key in list(self.proxies):
+            if key[0] == path and (interfaces is None or key[1] in interfaces):
+                del self.proxies[key]
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class UpdateCoalescer:
+    """Collects player updates for window seconds and then delivers them
+    together, so a burst of changes, e.g. skipping through tracks, reaches the
+    player once. Only the last value of each property is delivered, in the
+    order the last values arrived. Track values are merged key by key."""
+
+    def __init__(self, loop, deliver, window=0.1):
+        self.loop = loop
+        self.deliver = deliver
+        self.window = window
+        self.pending = {}
+        self.flushHandle = None
+        self.received = 0
+        self.delivered = 0
+
+    def update(self, name, value):
+        self.received += 1
+        previous = self.pending.pop(name, None)
+        if isinstance(previous, dict) and isinstance(value, dict):
+            value = {**previous, **value}
+        self.pending[name] = value
+        if self.flushHandle is None:
+            self.flushHandle = self.loop.call_later(self.window, self.flush)
+
+    def flush(self):
+        """Deliver all pending updates now. An update which fails to deliver is
+        logged and doesn't stop the rest."""
+        if self.flushHandle is not None:
+            self.flushHandle.cancel()
+            self.flushHandle = None
+        pending = self.pending
+        self.pending = {}
+        for name, value in pending.items():
+            self.delivered += 1
+            try:
+                self.deliver(name, value)
+            except Exception:
+                logging.exception(f"Error delivering {name} update to the player")
+
+    def coalesced_rate(self):
+        """Fraction of updates merged into later ones"""
+        return 1 - self.delivered / self.received if self.received else 0.0
+
+
+class DeviceHistory:
+    """Devices we have been connected to, saved to a file so reconnects can
+    try the most likely device first. Records by device path when each was
+    last connected and how many of our connects to it were tried and failed."""
+
+    recencyHalfLife = 24 * 60 * 60  # Seconds for a device's score to halve
+
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+        self.devices = {}
+        # One worker, so saves are written in order and never overlap
+        self.writer = ThreadPoolExecutor(max_workers=1)
+
+    def load(self):
+        try:
+            with open(self.path) as historyFile:
+                self.devices = json.load(historyFile)
+        except (OSError, ValueError) as e:
+            logging.debug(f"No device history loaded from {self.path}: {e}")
+            self.devices = {}
+        return self
+
+    def save(self, loop=None):
+        """Save the history. Given a loop, the file is written on a worker
+        thread so the loop doesn't wait for the disk, and a future is returned."""
+        contents = json.dumps(self.devices, indent=4)
+        if loop is None:
+            return self.write(contents)
+        return loop.run_in_executor(self.writer, self.write, contents)
+
+    def write(self, contents):
+        """Write the history via a temporary file, synced to disk before it
+        replaces the old one, so a power cut can't leave a partial history"""
+        tempPath = self.path + ".tmp"
+        try:
+            with open(tempPath, "w") as historyFile:
+                historyFile.write(contents)
+                historyFile.flush()
+                os.fsync(historyFile.fileno())
+            os.replace(tempPath, self.path)
+        except OSError as e:
+            logging.warning(f"Could not save device history to {self.path}: {e}")
+
+    def record(self, path):
+        return self.devices.setdefault(
+            str(path), {"lastConnected": 0, "attempts": 0, "failures": 0}
+        )
+
+    def attempted(self, path):
+        self.record(path)["attempts"] += 1
+
+    def failed(self, path):
+        self.record(path)["failures"] += 1
+
+    def connected(self, path):
+        self.record(path)["lastConnected"] = time.time()
+
+    def score(self, path):
+        """How likely a device is to be wanted and to connect. Its connect
+        success rate, halved for every recencyHalfLife since it last connected,
+        so a device which keeps failing drops behind one used a little earlier.
+        Devices which have never connected score 0."""
+        record = self.devices.get(str(path))
+        if not record or not record["lastConnected"]:
+            return 0.0
+        # One extra success assumed, so a single failure doesn't rule it out
+        successRate = (record["attempts"] - record["failures"] + 1) / (
+            record["attempts"] + 1
+        )
+        age = max(time.time() - record["lastConnected"], 0)
+        return successRate * 0.5 ** (age / self.recencyHalfLife)
+
+    def order(self, paths):
+        """paths sorted highest score first. Devices without history keep their
+        order, after the others."""
+        return sorted(paths, key=self.score, reverse=True)
+
+    def expected(self):
+        """The highest scoring device which has connected before, if any"""
+        connected = [
+            path for path in self.devices if self.devices[path]["lastConnected"]
+        ]
+        return self.order(connected)[0] if connected else None
 
 
 class BlueHandler(dbus.service.Object):
@@ -98,7 +380,9 @@ class BlueHandler(dbus.service.Object):
     position = None
     mainLoop = None
     connecting = False
-    # connectingEvent = asyncio.Event()
+    connectStagger = 2  # Seconds between starting connects to each device
+    connectTimeout = 30  # Seconds to wait for a device to connect
+    lastConnectTime = None
 
     def __init__(
         self,
@@ -107,34 +391,75 @@ class BlueHandler(dbus.service.Object):
         updatePlayer,
         capability="NoInputNoOutput",
         discoverTimeout="180",
+        coalesceWindow=0.1,
+        historyPath=HISTORY_PATH,
     ):
-        """Initialize gobject and find any current media players"""
+        """Initialize gobject and find any current media players. Updates for
+        the player are coalesced over coalesceWindow seconds."""
         self.capability = capability
-        self.update_player = updatePlayer
+        self.history = DeviceHistory(historyPath).load()
+        self.pendingConnects = {}
+        self.disconnecting = set()
+        self.updates = UpdateCoalescer(loop, updatePlayer, coalesceWindow)
+        self.update_player = self.updates.update
         self.bus = bus
         self.discoverTimeout = discoverTimeout
         self.mainLoop = loop
 
-        # asyncio.ensure_future(self.setup_async(), loop=self.mainLoop)
-
         dbus.service.Object.__init__(self, bus, BlueHandler.AGENT_PATH)
 
-        # self.bus.add_signal_receiver(
-        #     self.interfaces_added,
-        #     dbus_interface=MANAGER_IFACE,
-        #     signal_name="InterfacesAdded",
-        # )
-
+        self.objectTree = ObjectTree()
+        self.proxies = ProxyCache(bus)
+        self.bus.add_signal_receiver(
+            self.interfaces_added,
+            bus_name=SERVICE_NAME,
+            dbus_interface=MANAGER_IFACE,
+            signal_name="InterfacesAdded",
+        )
         self.bus.add_signal_receiver(
-            self.signal_handler,
+            self.interfaces_removed,
             bus_name=SERVICE_NAME,
-            dbus_interface=PROP_IFACE,
-            signal_name="PropertiesChanged",
-            path_keyword="path",
+            dbus_interface=MANAGER_IFACE,
+            signal_name="InterfacesRemoved",
         )
 
-        self.register_agent()
-        self.adapter = find_adapter()
+        # Only subscribe to property changes of interfaces with handlers. The
+        # arg0 match on the interface name lets the bus daemon drop the rest
+        # (RSSI, battery and so on) without waking us up.
+        self.propertyHandlers = self.property_handlers()
+        self.signalStats = {}
+        for interface in self.propertyHandlers:
+            self.bus.add_signal_receiver(
+                self.signal_handler,
+                bus_name=SERVICE_NAME,
+                dbus_interface=PROP_IFACE,
+                signal_name="PropertiesChanged",
+                path_keyword="path",
+                arg0=interface,
+            )
+
+        self.setupTask = asyncio.ensure_future(self.setup_async(), loop=self.mainLoop)
+        self.setupTask.add_done_callback(self.setup_done)
+
+    def call(self, method, *args, **keywords):
+        """Call a dbus method on the loop without blocking it"""
+        return dbus_call(self.mainLoop, method, *args, **keywords)
+
+    async def setup_async(self):
+        """Register the agent, load the BlueZ objects and find any current
+        media players, or reconnect to a device"""
+        await self.register_agent()
+        # Start connecting the last used device straight away, rather than
+        # after all BlueZ objects have been loaded
+        expectedPath = self.history.expected()
+        if expectedPath is not None:
+            self.pendingConnects[expectedPath] = self.connect_device(expectedPath)
+            self.pendingConnects[expectedPath].add_done_callback(
+                partial(self.early_connect_done, expectedPath)
+            )
+        # Signals are already subscribed, and any during the load are replayed
+        await self.objectTree.load(self.mainLoop, self.proxies.get("/", MANAGER_IFACE))
+        self.adapter = self.find_adapter()
         self.find_player()
 
         # self.adapter.StartDiscovery()
@@ -144,186 +469,351 @@ class BlueHandler(dbus.service.Object):
         # print(json.dumps(objects, indent=4))
 
         if self.device == None:
-            asyncio.ensure_future(self.connect_devices(), loop=self.mainLoop)
+            await self.connect_devices()
+
+    def setup_done(self, task):
+        """Stop the player if set up failed, as it did when set up ran in
+        __init__, rather than carrying on without an agent or adapter"""
+        if task.cancelled() or task.exception() is None:
+            return
+        logging.error("Bluetooth set up failed", exc_info=task.exception())
+        self.mainLoop.stop()
 
-    def register_agent(self):
+    async def register_agent(self):
         """Register BlueHandler as the default agent"""
-        manager = dbus.Interface(
-            self.bus.get_object(SERVICE_NAME, "/org/bluez"), "org.bluez.AgentManager1"
-        )
-        manager.RegisterAgent(BlueHandler.AGENT_PATH, self.capability)
-        manager.RequestDefaultAgent(BlueHandler.AGENT_PATH)
+        manager = self.proxies.get("/org/bluez", "org.bluez.AgentManager1")
+        await self.call(manager.RegisterAgent, BlueHandler.AGENT_PATH, self.capability)
+        await self.call(manager.RequestDefaultAgent, BlueHandler.AGENT_PATH)
         logging.debug("BlueHandler is registered as the default agent")
 
+    def find_adapter(self):
+        """Get the first bluetooth adapter"""
+        adapterPaths = self.objectTree.paths(ADAPTER_IFACE)
+        if not adapterPaths:
+            raise Exception("Bluetooth adapter not found")
+        return self.proxies.get(adapterPaths[0], ADAPTER_IFACE)
+
     def find_player(self):
         """Find any current media players and associated device"""
 
-        objects = get_managed_objects()
+        # print(json.dumps(self.objectTree.objects, indent=4))
 
-        # print(json.dumps(objects, indent=4))
-
-        player_path = None
-        transport_path = None
-        for path, interfaces in objects.items():
-            if PLAYER_IFACE in interfaces:
-                player_path = path
-            if TRANSPORT_IFACE in interfaces:
-                transport_path = path
+        playerPaths = self.objectTree.paths(PLAYER_IFACE)
+        transportPaths = self.objectTree.paths(TRANSPORT_IFACE)
+        player_path = playerPaths[-1] if playerPaths else None
+        transport_path = transportPaths[-1] if transportPaths else None
 
         if player_path:
             logging.debug(f"Found player on path [{player_path}]")
             self.connected = True
             self.get_player(player_path)
-            player_properties = self.player.GetAll(
-                PLAYER_IFACE, dbus_interface=PROP_IFACE
-            )
+            player_properties = self.objectTree.properties(player_path, PLAYER_IFACE)
             if "Status" in player_properties:
                 self.status = player_properties["Status"]
                 self.update_player("Status", dbus_decode(self.status))
             if "Track" in player_properties:
                 self.track = player_properties["Track"]
-                self.update_player("Track", dbus_decode(self.track))
+                self.update_player("Track", dbus_decode(self.track, TRACK_KEYS))
+            # After the track, which restarts the player's clock from 0
+            if "Position" in player_properties:
+                self.position = player_properties["Position"]
+                self.update_player("Position", dbus_decode(self.position))
         else:
             logging.debug("Could not find player")
             self.player = None
 
         if transport_path:
             logging.debug(f"Found transport on path [{transport_path}]")
-            self.transport = self.bus.get_object(SERVICE_NAME, transport_path)
+            self.transport = self.proxies.get(transport_path)
             logging.debug(f"Transport [{transport_path}] has been set")
-            transport_properties = self.transport.GetAll(
-                TRANSPORT_IFACE, dbus_interface=PROP_IFACE
+            transport_properties = self.objectTree.properties(
+                transport_path, TRANSPORT_IFACE
             )
             if "State" in transport_properties:
                 self.state = transport_properties["State"]
 
-    def reply_handler(self, devicePath, connectingEvent):
-        logging.info(f"successfully connected to device: {devicePath}")
-        self.connected = True
-        # remove_pending_connection(device_path)
-        asyncio.run_coroutine_threadsafe(event_setter(connectingEvent), self.mainLoop)
+    def connect_device(self, path):
+        """Start connecting a device. Returns a future for its path, which is
+        set once it's connected. If the future is cancelled before the device
+        connects, it is disconnected again."""
+        future = self.mainLoop.create_future()
+        device = self.proxies.get(path, DEVICE_IFACE)
+        logging.debug(f"trying to connect to {path}")
+        self.history.attempted(path)
+        device.Connect(
+            reply_handler=partial(self.reply_handler, path, future),
+            error_handler=partial(self.error_handler, path, future),
+            timeout=self.connectTimeout,
+        )
+        return future
 
-    def error_handler(self, e, devicePath, connectingEvent):
-        self.connected = False
-        logging.warning(
-            f"Error connecting to device: {devicePath}. Error: {e.get_dbus_message()}"
+    def reply_handler(self, devicePath, future):
+        self.mainLoop.call_soon_threadsafe(
+            self.connect_replied, devicePath, future, None
         )
-        asyncio.run_coroutine_threadsafe(event_setter(connectingEvent), self.mainLoop)
+
+    def error_handler(self, devicePath, future, e):
+        self.mainLoop.call_soon_threadsafe(self.connect_replied, devicePath, future, e)
+
+    def connect_replied(self, devicePath, future, error):
+        if error is not None and error.get_dbus_name() == ALREADY_CONNECTED:
+            error = None
+        if not future.cancelled():
+            if error is None:
+                self.history.connected(devicePath)
+                future.set_result(devicePath)
+            else:
+                self.history.failed(devicePath)
+                future.set_exception(error)
+            self.history.save(self.mainLoop)
+        elif error is None:
+            logging.debug(f"Disconnecting {devicePath}, another device connected")
+            self.disconnecting.add(str(devicePath))
+            self.proxies.get(devicePath, DEVICE_IFACE).Disconnect(
+                reply_handler=lambda: None, error_handler=lambda e: None
+            )
+
+    def early_connect_done(self, path, future):
+        if self.pendingConnects.get(path) is future:
+            del self.pendingConnects[path]
+        if future.cancelled():
+            return
+        if future.exception() is None:
+            logging.info(f"Connected to expected device {future.result()}")
+
+    async def connect_attempt(self, path, delay):
+        """Connect a device after delay seconds, or join a connect which is
+        already under way. Returns its path, or None if it couldn't be
+        connected."""
+        future = self.pendingConnects.pop(path, None)
+        if future is None:
+            await asyncio.sleep(delay)
+            future = self.connect_device(path)
+        try:
+            return await future
+        except dbus.exceptions.DBusException as e:
+            logging.warning(
+                f"Error connecting to device: {path}. Error: {e.get_dbus_message()}"
+            )
+            return None
+
+    def reconnect_candidates(self):
+        """Paths of paired devices to try to reconnect to"""
+        return [
+            path
+            for path in self.objectTree.paths(DEVICE_IFACE)
+            if self.objectTree.properties(path, DEVICE_IFACE).get("Paired", True)
+        ]
 
     async def connect_devices(self):
+        """Reconnect to the first paired device which answers. Connects are
+        started connectStagger seconds apart without waiting for earlier ones
+        to fail. The first to succeed wins, attempts which haven't started are
+        cancelled and any others which connect later are disconnected."""
         self.connecting = True
-        connectingEvent = asyncio.Event()
-        objects = get_managed_objects()
-        for path, ifaces in objects.items():
-            connectingEvent.clear()
-            deviceData = ifaces.get(DEVICE_IFACE)
-            if deviceData is None:
-                continue
-            device = dbus.Interface(
-                self.bus.get_object(SERVICE_NAME, path), DEVICE_IFACE
+        start = time.perf_counter()
+        candidates = self.history.order(self.reconnect_candidates())
+        attempts = [
+            asyncio.ensure_future(
+                self.connect_attempt(path, index * self.connectStagger),
+                loop=self.mainLoop,
             )
-            logging.debug(f"trying to connect to {path}")
-            device.Connect(
-                reply_handler=partial(
-                    self.reply_handler, devicePath=path, connectingEvent=connectingEvent
-                ),
-                error_handler=partial(
-                    self.error_handler, devicePath=path, connectingEvent=connectingEvent
-                ),
+            for index, path in enumerate(candidates)
+        ]
+        devicePath = None
+        try:
+            for attempt in asyncio.as_completed(attempts):
+                devicePath = await attempt
+                if devicePath is not None:
+                    break
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+        if devicePath is not None:
+            self.connected = True
+            self.get_device(devicePath)
+            self.lastConnectTime = time.perf_counter() - start
+            self.connecting = False
+            logging.info(
+                f"Connected to {devicePath} in {self.lastConnectTime:.1f} s, "
+                f"proxy cache hit rate {self.proxies.hit_rate():.0%}"
             )
-            # await self.waiting_func(connectingEvent)
-            await connectingEvent.wait()
-            # await connectingEvent.wait()
-            if self.connected == True:
-                self.connecting = False
-                logging.debug("Successfully connected")
-                return
+            return
+        self.connected = False
         await asyncio.sleep(3)  # Wait for connected status to stabilise
         logging.debug("Could not connect to any devices")
         self.connecting = False
-        # raise Exception("????")
 
     def get_player(self, path):
         """Get a media player from a dbus path, and the associated device"""
-        self.player = self.bus.get_object(SERVICE_NAME, path)
+        self.player = self.proxies.get(path)
         logging.debug("Player [{}] has been set".format(path))
-        device_path = self.player.Get(
-            "org.bluez.MediaPlayer1", "Device", dbus_interface=PROP_IFACE,
-        )
+        device_path = self.objectTree.properties(path, PLAYER_IFACE)["Device"]
         self.get_device(device_path)
 
     def get_device(self, path):
         """Get a device from a dbus path """
-        self.device = self.bus.get_object(SERVICE_NAME, path)
-        self.deviceAlias = self.device.Get(
-            DEVICE_IFACE, "Alias", dbus_interface=PROP_IFACE
-        )
+        if self.device is None or self.device.object_path != path:
+            # Also record devices which connected to us
+            self.history.connected(path)
+            self.history.save(self.mainLoop)
+        self.device = self.proxies.get(path)
+        deviceProperties = self.objectTree.properties(path, DEVICE_IFACE) or {}
+        self.deviceAlias = deviceProperties.get("Alias")
 
     def interfaces_added(self, path, interfaces):
-        print(path)
-        print(json.dumps(interfaces, indent=4))
+        logging.debug(f"Interfaces {list(interfaces)} added on path [{path}]")
+        self.objectTree.interfaces_added(path, interfaces)
+        if PLAYER_IFACE in interfaces or TRANSPORT_IFACE in interfaces:
+            self.find_player()
+
+    def interfaces_removed(self, path, interfaces):
+        logging.debug(f"Interfaces {list(interfaces)} removed on path [{path}]")
+        self.objectTree.interfaces_removed(path, interfaces)
+        if str(path) not in self.objectTree.objects:
+            # The whole object is gone
+            self.proxies.invalidate(path)
+        else:
+            self.proxies.invalidate(path, interfaces)
+        if PLAYER_IFACE in interfaces and self.player is not None:
+            if self.player.object_path == path:
+                self.player = None
+        if TRANSPORT_IFACE in interfaces and self.transport is not None:
+            if self.transport.object_path == path:
+                self.transport = None
+
+    def property_handlers(self):
+        """Handlers for the properties of each interface we subscribe to"""
+        return {
+            DEVICE_IFACE: {"Connected": self.connected_changed},
+            CONTROL_IFACE: {"Connected": self.control_connected_changed},
+            TRANSPORT_IFACE: {"State": self.state_changed},
+            PLAYER_IFACE: {
+                "Track": self.track_changed,
+                "Status": self.status_changed,
+                "Position": self.position_changed,
+            },
+            ADAPTER_IFACE: {"Discoverable": self.discoverable_changed},
+        }
 
     def signal_handler(self, interface, changed, invalidated, path):
         """Handle relevant property change signals"""
-        logging.debug(f"Interface [{interface}] changed [{changed}] on path [{path}]")
-        iface = interface[interface.rfind(".") + 1 :]
-        if "Connected" in changed:
-            self.connected = changed["Connected"]
-            if changed["Connected"] == False:
-                # FIXME check if anything trying to connect?
-                if self.connecting == False:
-                    asyncio.ensure_future(self.connect_devices(), loop=self.mainLoop)
-            if iface == "MediaControl1":
-                self.find_player()
-                self.update_player(
-                    "Connected", dbus_decode([self.connected, self.deviceAlias])
-                )
-        if "State" in changed:
-            self.state = changed["State"]
-            self.update_player("State", dbus_decode(self.state))
-        if "Track" in changed:
-            self.track = changed["Track"]
-            self.update_player("Track", dbus_decode(self.track))
-        if "Status" in changed:
-            self.status = changed["Status"]
-            self.update_player("Status", dbus_decode(self.status))
-        if "Position" in changed:
-            self.position = changed["Position"]
-            self.update_player("Position", dbus_decode(self.position))
-        if "Discoverable" in changed:
-            self.discoverable = changed["Discoverable"]
-            self.update_player("Discoverable", dbus_decode(self.discoverable))
-
-    def set_discoverable(self, on=True):
+        start = time.perf_counter()
+        logging.debug(
+            "Interface [%s] changed [%s] on path [%s]", interface, changed, path
+        )
+        self.objectTree.properties_changed(interface, changed, invalidated, path)
+        for name, handler in self.propertyHandlers.get(interface, {}).items():
+            if name in changed:
+                handler(changed[name], path)
+        stats = self.signalStats.setdefault(interface, [0, 0.0])
+        stats[0] += 1
+        stats[1] += time.perf_counter() - start
+
+    def signal_stats(self):
+        """Number of signals handled and microseconds per signal by interface"""
+        return {
+            interface: {"signals": count, "usPerSignal": seconds / count * 1e6}
+            for interface, (count, seconds) in self.signalStats.items()
+        }
+
+    def report(self):
+        signals = ", ".join(
+            f"{interface} {stats['signals']} at {stats['usPerSignal']:.0f} us"
+            for interface, stats in self.signal_stats().items()
+        )
+        return (
+            f"Bluetooth updates {self.updates.coalesced_rate():.0%} coalesced, "
+            f"proxy cache hit rate {self.proxies.hit_rate():.0%}, "
+            f"signals handled: {signals or 'none'}"
+        )
+
+    def is_current_device(self, path):
+        """Whether a Connected change on path is about the device in use. Devices
+        we disconnect after losing a reconnect race, and any other device while
+        one is in use, don't change the connection state."""
+        path = str(path)
+        if path in self.disconnecting:
+            properties = self.objectTree.properties(path, DEVICE_IFACE) or {}
+            if not properties.get("Connected"):
+                self.disconnecting.discard(path)
+            return False
+        return self.device is None or self.device.object_path == path
+
+    def connected_changed(self, connected, path):
+        if not self.is_current_device(path):
+            return
+        self.connected = connected
+        if connected and self.device is None:
+            # A device which connected to us by itself
+            self.get_device(path)
+        if connected == False:
+            # Let the next device to connect become the current one
+            self.device = None
+            self.deviceAlias = None
+            # FIXME check if anything trying to connect?
+            if self.connecting == False:
+                asyncio.ensure_future(self.connect_devices(), loop=self.mainLoop)
+
+    def control_connected_changed(self, connected, path):
+        if not self.is_current_device(path):
+            return
+        self.connected_changed(connected, path)
+        self.find_player()
+        # The alias of this device, as the current one is cleared on disconnect
+        properties = self.objectTree.properties(path, DEVICE_IFACE) or {}
+        alias = properties.get("Alias", self.deviceAlias)
+        self.update_player("Connected", dbus_decode([self.connected, alias]))
+
+    def state_changed(self, state, path):
+        self.state = state
+        self.update_player("State", dbus_decode(self.state))
+
+    def track_changed(self, track, path):
+        self.track = track
+        self.update_player("Track", dbus_decode(self.track, TRACK_KEYS))
+
+    def status_changed(self, status, path):
+        self.status = status
+        self.update_player("Status", dbus_decode(self.status))
+
+    def position_changed(self, position, path):
+        self.position = position
+        self.update_player("Position", dbus_decode(self.position))
+
+    def discoverable_changed(self, discoverable, path):
+        self.discoverable = discoverable
+        self.update_player("Discoverable", dbus_decode(self.discoverable))
+
+    async def set_discoverable(self, on=True):
         """Make the adapter discoverable"""
+        if self.adapter is None:
+            logging.warning("No bluetooth adapter to make discoverable")
+            return
         adapter_path = self.adapter.object_path
-        adapter = dbus.Interface(
-            self.bus.get_object(SERVICE_NAME, adapter_path), PROP_IFACE,
-        )
-        adapter.Set(
-            ADAPTER_IFACE, "DiscoverableTimeout", dbus.UInt32(self.discoverTimeout)
+        adapter = self.proxies.get(adapter_path, PROP_IFACE)
+        await self.call(
+            adapter.Set,
+            ADAPTER_IFACE,
+            "DiscoverableTimeout",
+            dbus.UInt32(self.discoverTimeout),
         )
-        adapter.Set(ADAPTER_IFACE, "Discoverable", on)
+        await self.call(adapter.Set, ADAPTER_IFACE, "Discoverable", on)
         logging.debug(
             "Bluetooth is discoverable" if on else "Bluetooth is no longer discoverable"
         )
 
-    def send_command(self, command):
-        commands = {
-            "Play": self.player.Play(dbus_interface=PLAYER_IFACE),
-            "Pause": self.player.Pause(dbus_interface=PLAYER_IFACE),
-            "Next": self.player.Next(dbus_interface=PLAYER_IFACE),
-            "Previous": self.player.Previous(dbus_interface=PLAYER_IFACE),
-            "FastForward": self.player.FastForward(dbus_interface=PLAYER_IFACE),
-            "Rewind": self.player.Rewind(dbus_interface=PLAYER_IFACE),
-        }
+    async def send_command(self, command):
+        commands = ("Play", "Pause", "Next", "Previous", "FastForward", "Rewind")
         # TODO: Fix volume adjustments
         # if command == "VolumeUp":
         #     self.transport.Volume(dbus_interface=TRANSPORT_IFACE) += 5
         # elif command == "VolumeDown":
         #     self.transport.Volume(dbus_interface=TRANSPORT_IFACE) -= 5
         # else:
-        commands[command]()
+        if command not in commands or self.player is None:
+            return
+        await self.call(getattr(self.player, command), dbus_interface=PLAYER_IFACE)
 
     """Pairing agent methods"""
 
@@ -356,8 +846,18 @@ class BlueHandler(dbus.service.Object):
         self.trustDevice(device)
 
     def trustDevice(self, path):
-        """Set the device to trusted"""
-        device_properties = dbus.Interface(
-            self.bus.get_object(SERVICE_NAME, path), PROP_IFACE
-        )
-        device_properties.Set(DEVICE_IFACE, "Trusted", True)
+        """Set the device to trusted, without waiting for BlueZ to reply"""
+        device_properties = self.proxies.get(path, PROP_IFACE)
+        asyncio.ensure_future(
+            self.call(device_properties.Set, DEVICE_IFACE, "Trusted", True),
+            loop=self.mainLoop,
+        ).add_done_callback(partial(self.trust_done, path))
+
+    def trust_done(self, path, future):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            logging.warning(
+                f"Error trusting device: {path}. Error: {error.get_dbus_message()}"
+            )
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+"""Micro-benchmark of decoding BlueZ PropertiesChanged payloads.
+
+Compares the original isinstance chain decoder against BlueHandler.dbus_decode
+on Track and Position payloads as recorded from phones, and checks that both
+give the same values for the keys the player uses.
+"""
+
+import timeit
+
+import dbus
+
+from BlueHandler import TRACK_KEYS, dbus_decode
+
+REPEATS = 10000
+
+# MediaPlayer1 PropertiesChanged payloads as received from BlueZ
+TRACK_PAYLOADS = {
+    "Android": dbus.Dictionary(
+        {
+            dbus.String("Title"): dbus.String("Bohemian Rhapsody", variant_level=1),
+            dbus.String("Artist"): dbus.String("Queen", variant_level=1),
+            dbus.String("Album"): dbus.String(
+                "A Night at the Opera (2011 Remaster)", variant_level=1
+            ),
+            dbus.String("Genre"): dbus.String("Rock", variant_level=1),
+            dbus.String("NumberOfTracks"): dbus.UInt32(12, variant_level=1),
+            dbus.String("TrackNumber"): dbus.UInt32(11, variant_level=1),
+            dbus.String("Duration"): dbus.UInt32(354947, variant_level=1),
+        },
+        signature=dbus.Signature("sv"),
+        variant_level=1,
+    ),
+    "iPhone": dbus.Dictionary(
+        {
+            dbus.String("Title"): dbus.String("Midnight City", variant_level=1),
+            dbus.String("Artist"): dbus.String("M83", variant_level=1),
+            dbus.String("Album"): dbus.String(
+                "Hurry Up, We're Dreaming", variant_level=1
+            ),
+            dbus.String("Genre"): dbus.String("Electronic", variant_level=1),
+            dbus.String("NumberOfTracks"): dbus.UInt32(22, variant_level=1),
+            dbus.String("TrackNumber"): dbus.UInt32(2, variant_level=1),
+            dbus.String("Duration"): dbus.UInt32(243960, variant_level=1),
+            dbus.String("ImgHandle"): dbus.String("1000004", variant_level=1),
+        },
+        signature=dbus.Signature("sv"),
+        variant_level=1,
+    ),
+}
+POSITION_PAYLOAD = dbus.UInt32(83512, variant_level=1)
+
+
+def legacy_decode(data):
+    """The original dbus_decode"""
+    if isinstance(data, dbus.String):
+        data = str(data)
+    elif isinstance(data, dbus.Boolean):
+        data = bool(data)
+    elif (
+        isinstance(data, dbus.UInt32)
+        or isinstance(data, dbus.UInt64)
+        or isinstance(data, dbus.UInt16)
+        or isinstance(data, dbus.Int32)
+        or isinstance(data, dbus.Int64)
+        or isinstance(data, dbus.UInt16)
+    ):
+        data = int(data)
+    elif isinstance(data, dbus.Double):
+        data = float(data)
+    elif isinstance(data, dbus.Array):
+        data = [legacy_decode(value) for value in data]
+    elif isinstance(data, dbus.Dictionary):
+        new_data = dict()
+        for key in data.keys():
+            new_data[legacy_decode(key)] = legacy_decode(data[key])
+        data = new_data
+    return data
+
+
+def per_signal_us(decode, payload):
+    return timeit.timeit(lambda: decode(payload), number=REPEATS) / REPEATS * 1e6
+
+
+def main():
+    print(f"{'payload':<16}{'legacy us':>11}{'decode us':>11}{'used keys us':>14}")
+    for name, payload in TRACK_PAYLOADS.items():
+        legacy = legacy_decode(payload)
+        decoded = dbus_decode(payload, TRACK_KEYS)
+        assert decoded == {key: legacy[key] for key in TRACK_KEYS if key in legacy}
+        assert all(type(value) in (str, int) for value in decoded.values())
+        print(
+            f"{'Track ' + name:<16}{per_signal_us(legacy_decode, payload):>11.2f}"
+            f"{per_signal_us(dbus_decode, payload):>11.2f}"
+            f"{per_signal_us(lambda data: dbus_decode(data, TRACK_KEYS), payload):>14.2f}"
+        )
+    assert dbus_decode(POSITION_PAYLOAD) == legacy_decode(POSITION_PAYLOAD)
+    print(
+        f"{'Position':<16}{per_signal_us(legacy_decode, POSITION_PAYLOAD):>11.2f}"
+        f"{per_signal_us(dbus_decode, POSITION_PAYLOAD):>11.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+"""Preloaded icons and static graphics for the display.
+
+All images under Images/ are loaded once, converted to 1 bit and packed into
+SSD1305 page format. They can be saved to a single bundle file which is loaded
+instead of the images when it is newer than all of them:
+    python3 DisplayAssets.py
+"""
+
+import logging
+import os
+import struct
+import sys
+import time
+
+from PIL import Image
+
+from DisplayPages import pack_pages, unpack_pages
+
+IMAGE_DIR = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Images")
+)
+BUNDLE_PATH = os.path.join(IMAGE_DIR, "assets.bundle")
+IMAGE_EXTENSIONS = (".png", ".bmp", ".gif")
+
+# Bundle file: header of magic and asset count, then for every asset the name
+# length, width and height, followed by the name and the page format bytes.
+BUNDLE_MAGIC = b"RPAB"
+BUNDLE_HEADER = struct.Struct("<4sH")
+ASSET_HEADER = struct.Struct("<HHH")
+
+
+class Asset:
+    """A 1 bit image ready to paste"""
+
+    def __init__(self, name, image):
+        self.name = name
+        self.image = image
+        self.width, self.height = image.size
+
+    @classmethod
+    def from_image(cls, name, image):
+        return cls(name, image.convert("1"))
+
+    @classmethod
+    def from_pages(cls, name, width, height, pages):
+        pageCount = (height + 7) // 8
+        image = unpack_pages(pages, width, pageCount * 8).crop((0, 0, width, height))
+        return cls(name, image)
+
+    def pages(self):
+        """The image in page format, padded to whole pages, for the bundle file"""
+        pageCount = (self.height + 7) // 8
+        padded = Image.new("1", (self.width, pageCount * 8))
+        padded.paste(self.image, (0, 0))
+        return b"".join(pack_pages(padded, 0, self.width - 1, 0, pageCount - 1))
+
+
+class AssetBundle:
+    """All display images, loaded once. Images are looked up by their path
+    relative to imageDir without the extension, e.g. "Bluetooth"."""
+
+    def __init__(self, imageDir=IMAGE_DIR, bundlePath=BUNDLE_PATH):
+        self.imageDir = imageDir
+        self.bundlePath = bundlePath
+        self.assets = {}
+        self.loadTime = None
+
+    def load(self):
+        start = time.perf_counter()
+        imagePaths = self.image_paths()
+        if self.bundle_is_current(imagePaths):
+            source = self.bundlePath
+            self.load_bundle(self.bundlePath)
+        else:
+            source = self.imageDir
+            self.load_images(imagePaths)
+        self.loadTime = time.perf_counter() - start
+        logging.info(
+            f"Loaded {len(self.assets)} display assets from {source} "
+            f"in {self.loadTime * 1000:.1f} ms"
+        )
+        return self
+
+    def get(self, name):
+        """The ready to paste 1 bit image of an asset"""
+        return self.assets[name].image
+
+    def image_paths(self):
+        paths = {}
+        for directory, _, files in os.walk(self.imageDir):
+            for fileName in sorted(files):
+                root, extension = os.path.splitext(fileName)
+                if extension.lower() in IMAGE_EXTENSIONS:
+                    path = os.path.join(directory, fileName)
+                    name = os.path.relpath(os.path.join(directory, root), self.imageDir)
+                    paths[name.replace(os.sep, "/")] = path
+        return paths
+
+    def bundle_is_current(self, imagePaths):
+        if self.bundlePath is None or not os.path.exists(self.bundlePath):
+            return False
+        bundleTime = os.path.getmtime(self.bundlePath)
+        return all(os.path.getmtime(path) <= bundleTime for path in imagePaths.values())
+
+    def load_images(self, imagePaths):
+        for name, path in imagePaths.items():
+            with Image.open(path) as image:
+                self.assets[name] = Asset.from_image(name, image)
+
+    def load_bundle(self, path):
+        with open(path, "rb") as bundleFile:
+            magic, count = BUNDLE_HEADER.unpack(bundleFile.read(BUNDLE_HEADER.size))
+            if magic != BUNDLE_MAGIC:
+                raise ValueError(f"{path} is not an asset bundle")
+            for _ in range(count):
+                nameLength, width, height = ASSET_HEADER.unpack(
+                    bundleFile.read(ASSET_HEADER.size)
+                )
+                name = bundleFile.read(nameLength).decode("utf-8")
+                pages = bundleFile.read(width * ((height + 7) // 8))
+                self.assets[name] = Asset.from_pages(name, width, height, pages)
+
+    def save_bundle(self, path=None):
+        """Write all loaded assets to a bundle file. Written to a temporary file
+        which is synced to disk before it replaces the old bundle, so a power cut
+        can't leave a partial bundle."""
+        path = path or self.bundlePath
+        tempPath = path + ".tmp"
+        with open(tempPath, "wb") as bundleFile:
+            bundleFile.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, len(self.assets)))
+            for asset in self.assets.values():
+                name = asset.name.encode("utf-8")
+                bundleFile.write(
+                    ASSET_HEADER.pack(len(name), asset.width, asset.height)
+                )
+                bundleFile.write(name)
+                bundleFile.write(asset.pages())
+            bundleFile.flush()
+            os.fsync(bundleFile.fileno())
+        os.replace(tempPath, path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    bundle = AssetBundle(bundlePath=None).load()
+    bundle.save_bundle(sys.argv[1] if len(sys.argv) > 1 else BUNDLE_PATH)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+"""Backends which LCDDisplay sends SSD1305 page/column data to.
+- SSD1305Backend for the OLED panel on SPI
+- VirtualBackend for an in-memory display which records every frame
+"""
+
+import logging
+import os
+import struct
+import time
+
+from DisplayPages import unpack_pages
+
+# SSD1305 window addressing commands
+SSD1305_COLUMNADDR = 0x21
+SSD1305_PAGEADDR = 0x22
+
+# Binary frame log: file header of magic, width and height, then for every
+# frame a timestamp followed by the whole display RAM.
+FRAME_LOG_MAGIC = b"RPFL"
+FRAME_LOG_HEADER = struct.Struct("<4sHH")
+FRAME_LOG_TIMESTAMP = struct.Struct("<d")
+
+
+def read_frame_log(path):
+    """Read a binary frame log. Returns width, height and a list of
+    (timestamp, ram) frames."""
+    with open(path, "rb") as logFile:
+        magic, width, height = FRAME_LOG_HEADER.unpack(
+            logFile.read(FRAME_LOG_HEADER.size)
+        )
+        if magic != FRAME_LOG_MAGIC:
+            raise ValueError(f"{path} is not a frame log")
+        frameSize = width * height // 8
+        frames = []
+        while True:
+            timestamp = logFile.read(FRAME_LOG_TIMESTAMP.size)
+            if len(timestamp) < FRAME_LOG_TIMESTAMP.size:
+                break
+            frames.append(
+                (FRAME_LOG_TIMESTAMP.unpack(timestamp)[0], logFile.read(frameSize))
+            )
+    return width, height, frames
+
+
+class DisplayBackend:
+    """A display which accepts SSD1305 page/column windows. Display RAM is
+    expected to be blank once the backend has been created."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.pages = height // 8
+
+    def write_window(self, col0, col1, page0, page1, data):
+        """Write page/column bytes to a window of the display RAM"""
+        raise NotImplementedError
+
+    def end_frame(self):
+        """Called once all windows of a flush have been written"""
+
+
+class SSD1305Backend(DisplayBackend):
+    """SSD1305 OLED panel on hardware SPI. pins maps "cs", "dc" and "rs" to board
+    pin names."""
+
+    def __init__(self, pins, width, height):
+        super().__init__(width, height)
+        # Hardware libraries are only needed (and only importable) on the Pi
+        import board
+        import digitalio
+        import adafruit_ssd1305
+
+        pinIO = {
+            name: digitalio.DigitalInOut(getattr(board, pin))
+            for name, pin in pins.items()
+        }
+        self.driver = adafruit_ssd1305.SSD1305_SPI(
+            width, height, board.SPI(), pinIO["dc"], pinIO["rs"], pinIO["cs"]
+        )
+        self.columnOffset = self.driver._column_offset
+
+    def write_cmds(self, cmds):
+        """Send a sequence of command bytes in one SPI transfer"""
+        self.driver.dc_pin.value = False
+        with self.driver.spi_device as spi:
+            spi.write(bytearray(cmds))
+
+    def write_data(self, data):
+        """Send a block of display data in one SPI transfer"""
+        self.driver.dc_pin.value = True
+        with self.driver.spi_device as spi:
+            spi.write(data)
+
+    def write_window(self, col0, col1, page0, page1, data):
+        self.write_cmds(
+            (
+                SSD1305_COLUMNADDR,
+                col0 + self.columnOffset,
+                col1 + self.columnOffset,
+                SSD1305_PAGEADDR,
+                page0,
+                page1,
+            )
+        )
+        self.write_data(data)
+
+
+class VirtualBackend(DisplayBackend):
+    """In-memory display RAM which records every flushed frame with a timestamp.
+    Frames can also be saved as a PNG sequence in pngDir and/or appended to a
+    binary frame log at frameLog."""
+
+    def __init__(self, width, height, keepFrames=True, pngDir=None, frameLog=None):
+        super().__init__(width, height)
+        self.ram = bytearray(width * self.pages)
+        self.keepFrames = keepFrames
+        self.frames = []
+        self.frameCount = 0
+        self.pngDir = pngDir
+        if pngDir is not None:
+            os.makedirs(pngDir, exist_ok=True)
+        self.frameLog = None
+        if frameLog is not None:
+            self.frameLog = open(frameLog, "wb")
+            self.frameLog.write(FRAME_LOG_HEADER.pack(FRAME_LOG_MAGIC, width, height))
+
+    def write_window(self, col0, col1, page0, page1, data):
+        columns = col1 - col0 + 1
+        for index, page in enumerate(range(page0, page1 + 1)):
+            start = page * self.width + col0
+            self.ram[start : start + columns] = data[
+                index * columns : (index + 1) * columns
+            ]
+
+    def end_frame(self):
+        timestamp = time.monotonic()
+        ram = bytes(self.ram)
+        if self.keepFrames:
+            self.frames.append((timestamp, ram))
+        if self.pngDir is not None:
+            self.image().save(
+                os.path.join(self.pngDir, f"frame{self.frameCount:05d}.png")
+            )
+        if self.frameLog is not None:
+            self.frameLog.write(FRAME_LOG_TIMESTAMP.pack(timestamp))
+            self.frameLog.write(ram)
+        self.frameCount += 1
+        logging.debug(f"Virtual display frame {self.frameCount}")
+
+    def image(self, ram=None):
+        """The current (or a recorded) display RAM as a 1 bit image"""
+        return unpack_pages(self.ram if ram is None else ram, self.width, self.height)
+
+    def close(self):
+        if self.frameLog is not None:
+            self.frameLog.close()
+            self.frameLog = None
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+"""Display rendering benchmarks.
+
+Drives PlayerDisplay through realistic scenarios on a virtual display (or an
+in-memory SPI sink using the real SSD1305 command framing) and reports frames
+per second, bytes per frame and CPU time per frame split into stages:
+- rasterize: rendering text bitmaps
+- pack: packing dirty areas into page/column bytes
+- transfer: sending windows to the backend, on the transfer thread
+- layout: everything else (zone logic, drawing and scheduling)
+
+Results can be saved and later compared to catch regressions:
+    python3 DisplayBenchmark.py --save baseline.json
+    python3 DisplayBenchmark.py --compare baseline.json
+
+--import-time measures importing PlayerDisplay in a fresh interpreter, which
+should not load PIL or the display hardware libraries.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import subprocess
+import sys
+import time
+
+from DisplayBackend import DisplayBackend, SSD1305Backend, VirtualBackend
+from PlayerDisplay import PlayerDisplay, displayWidth, displayHeight
+
+TRACK_LENGTH = 215000
+SHORT_TRACK = {"Title": "Short Title", "Artist": "Artist", "Album": "Album"}
+LONG_TRACK = {
+    "Title": "A Very Long Track Title That Will Not Fit On The Top Bar",
+    "Artist": "Some Artist With A Long Name",
+    "Album": "And An Even Longer Album Name",
+}
+
+
+class SinkBackend(SSD1305Backend):
+    """SSD1305Backend which writes to an in-memory SPI sink instead of the panel"""
+
+    def __init__(self, width, height):
+        DisplayBackend.__init__(self, width, height)
+        self.columnOffset = 4
+        self.commandBytes = 0
+        self.dataBytes = 0
+        self.transfers = 0
+
+    def write_cmds(self, cmds):
+        self.commandBytes += len(cmds)
+        self.transfers += 1
+
+    def write_data(self, data):
+        self.dataBytes += len(data)
+        self.transfers += 1
+
+    def bytes_sent(self):
+        return self.commandBytes + self.dataBytes
+
+
+async def positions(player, duration, interval=1):
+    """Send a position update every interval seconds"""
+    for tick in range(int(duration / interval)):
+        await player.update_position(int(tick * interval * 1000), TRACK_LENGTH)
+        await asyncio.sleep(interval)
+
+
+async def track_change(player, duration):
+    """A new (short) track every second"""
+    for number in range(int(duration)):
+        track = dict(SHORT_TRACK, Title=f"Track {number}")
+        await player.update_track(track)
+        await asyncio.sleep(1)
+
+
+async def position_update(player, duration):
+    """One position update per second"""
+    await player.update_track(SHORT_TRACK)
+    await positions(player, duration)
+
+
+async def scrolling_title(player, duration):
+    """A scrolling title with the progress bar updating 4 times a second"""
+    await player.update_track(LONG_TRACK)
+    await positions(player, duration, interval=0.25)
+
+
+async def flash_over_track(player, duration):
+    """Flash messages appearing over track info every 2 seconds"""
+    await player.update_track(LONG_TRACK)
+    positionTask = asyncio.create_task(positions(player, duration))
+    for _ in range(int(duration / 2)):
+        await player.flash_message("Connected to Phone", time=1)
+        await asyncio.sleep(1)
+        await player.update_track(LONG_TRACK)
+    await positionTask
+
+
+SCENARIOS = {
+    "track_change": track_change,
+    "position_update": position_update,
+    "scrolling_title": scrolling_title,
+    "flash_over_track": flash_over_track,
+}
+
+
+async def run_scenario(scenario, backendType, duration):
+    if backendType == "sink":
+        backend = SinkBackend(displayWidth, displayHeight)
+    else:
+        backend = VirtualBackend(displayWidth, displayHeight, keepFrames=False)
+    player = PlayerDisplay(asyncio.get_running_loop(), backend=backend)
+    player.setup()
+    display = player.display
+    # Don't count start up
+    display.flush()
+    display.wait_for_transfers()
+    startFrames = display.framesFlushed
+    startBytes = display.bytesSent
+    startDropped = display.droppedFrames
+    textCache = display.textCache
+    startHits, startMisses = textCache.hits, textCache.misses
+    startStages = (textCache.renderTime, display.packTime, display.transferTime)
+
+    wallStart = time.perf_counter()
+    cpuStart = time.process_time()
+    await scenario(player, duration)
+    display.flush()
+    display.wait_for_transfers()
+    cpu = time.process_time() - cpuStart
+    wall = time.perf_counter() - wallStart
+
+    player.wholeDisplay.cancel_task()
+    if display.frameTask is not None:
+        display.frameTask.cancel()
+
+    frames = max(display.framesFlushed - startFrames, 1)
+    if backendType == "sink":
+        bytesSent = backend.bytes_sent()
+    else:
+        bytesSent = display.bytesSent - startBytes
+    stages = {
+        "rasterize": textCache.renderTime - startStages[0],
+        "pack": display.packTime - startStages[1],
+        "transfer": display.transferTime - startStages[2],
+    }
+    hits = textCache.hits - startHits
+    lookups = hits + textCache.misses - startMisses
+    stages["layout"] = max(cpu - sum(stages.values()), 0.0)
+    return {
+        "frames": frames,
+        "fps": frames / wall,
+        "bytesPerFrame": bytesSent / frames,
+        "cpuPerFrameUs": cpu / frames * 1e6,
+        "stagesPerFrameUs": {
+            stage: stageTime / frames * 1e6 for stage, stageTime in stages.items()
+        },
+        "textCacheHitRate": hits / lookups if lookups else 0.0,
+        "droppedFrames": display.droppedFrames - startDropped,
+    }
+
+
+def import_time():
+    """Time importing PlayerDisplay in a fresh interpreter. Returns the time in
+    seconds and any heavy modules which were imported with it."""
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import PlayerDisplay\n"
+        "print(time.perf_counter() - start)\n"
+        "print(' '.join(m for m in ('PIL', 'board', 'adafruit_ssd1305') "
+        "if m in sys.modules))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    return float(output[0]), output[1].split() if len(output) > 1 else []
+
+
+def print_results(results):
+    print(
+        f"{'scenario':<18}{'frames':>7}{'fps':>7}{'B/frame':>9}{'us/frame':>10}"
+        f"{'layout':>9}{'raster':>9}{'pack':>9}{'xfer':>9}{'dropped':>9}"
+    )
+    for name, result in results.items():
+        stages = result["stagesPerFrameUs"]
+        print(
+            f"{name:<18}{result['frames']:>7}{result['fps']:>7.1f}"
+            f"{result['bytesPerFrame']:>9.1f}{result['cpuPerFrameUs']:>10.1f}"
+            f"{stages['layout']:>9.1f}{stages['rasterize']:>9.1f}"
+            f"{stages['pack']:>9.1f}{stages['transfer']:>9.1f}"
+            f"{result['droppedFrames']:>9}"
+        )
+
+
+def compare_results(results, baseline, tolerance):
+    """Return a list of metrics which are worse than the baseline"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric in ("bytesPerFrame", "cpuPerFrameUs"):
+            limit = baseline[name][metric] * (1 + tolerance)
+            if result[metric] > limit:
+                regressions.append(
+                    f"{name} {metric}: {result[metric]:.1f} > {limit:.1f}"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["virtual", "sink"], default="virtual")
+    parser.add_argument("--duration", type=float, default=5, help="Seconds each")
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append")
+    parser.add_argument("--save", help="Save results as JSON")
+    parser.add_argument("--compare", help="Compare against saved JSON results")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--import-time", action="store_true")
+    args = parser.parse_args()
+
+    if args.import_time:
+        seconds, heavyModules = import_time()
+        print(f"PlayerDisplay import: {seconds * 1000:.1f} ms")
+        if heavyModules:
+            print(f"Imported eagerly: {', '.join(heavyModules)}")
+            sys.exit(1)
+        return
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        results[name] = asyncio.run(
+            run_scenario(SCENARIOS[name], args.backend, args.duration)
+        )
+    print_results(results)
+
+    if args.save:
+        with open(args.save, "w") as resultsFile:
+            json.dump(results, resultsFile, indent=4)
+    if args.compare:
+        with open(args.compare) as baselineFile:
+            regressions = compare_results(
+                results, json.load(baselineFile), args.tolerance
+            )
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
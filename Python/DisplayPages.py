@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+"""Conversion between 1 bit PIL images and SSD1305 page/column bytes.
+
+Each byte holds a vertical strip of 8 pixels (LSB at the top) and bytes are
+ordered page by page, left to right, which is the layout of display RAM. Only
+needs PIL, so the player and the standalone SSD1305 driver can both use it.
+"""
+
+from PIL import Image
+
+# Bit reversal lookup. PIL packs 1 bit rows MSB first (top pixel of a transposed
+# column) but the display wants the top pixel of each page in the LSB.
+REVERSE_BITS = bytes(int(f"{byte:08b}"[::-1], 2) for byte in range(256))
+
+
+def pack_pages(image, col0, col1, page0, page1, buffer=None):
+    """Pack columns col0-col1 of pages page0-page1 (inclusive) of a 1 bit image
+    into SSD1305 page/column bytes. Returns one bytes object per page, or writes
+    the pages one after another into buffer and returns it."""
+    pages = page1 - page0 + 1
+    box = (col0, page0 * 8, col1 + 1, (page1 + 1) * 8)
+    band = image if box == (0, 0, *image.size) else image.crop(box)
+    # Transposing turns every display column into an image row, so tobytes()
+    # gives the pages of each column as consecutive bytes.
+    columns = band.transpose(Image.TRANSPOSE).tobytes().translate(REVERSE_BITS)
+    if buffer is None:
+        return [columns[page::pages] for page in range(pages)]
+    width = col1 - col0 + 1
+    for page in range(pages):
+        buffer[page * width : (page + 1) * width] = columns[page::pages]
+    return buffer
+
+
+def unpack_pages(ram, width, height):
+    """Convert SSD1305 page/column bytes back into a 1 bit image"""
+    pages = height // 8
+    columns = bytearray(len(ram))
+    for page in range(pages):
+        columns[page::pages] = ram[page * width : (page + 1) * width]
+    image = Image.frombytes(
+        "1", (height, width), bytes(columns.translate(REVERSE_BITS))
+    )
+    return image.transpose(Image.TRANSPOSE)
@@ -1,29 +1,231 @@
 #!/usr/bin/env python3
 
-import board
-import digitalio
-from PIL import Image, ImageDraw, ImageFont
-import adafruit_ssd1305
+# Importing this module has no side effects. PIL, the display modules which
+# need it and the display hardware are only loaded once a display is set up.
 import random
 import asyncio
+import time
+import math
+import threading
+from collections import OrderedDict
 
 import logging
 
-logging.basicConfig(level=logging.INFO)
 
-
-class LCDDisplay(adafruit_ssd1305.SSD1305_SPI):
-    """OLED display driver"""
-
-    def __init__(self, pins, width, height):
-        super().__init__(
-            width, height, board.SPI(), pins["dc"], pins["rs"], pins["cs"],
+class TextCache:
+    """LRU cache of rendered 1 bit text bitmaps, capped by memory use"""
+
+    def __init__(self, maxBytes=256 * 1024):
+        self.maxBytes = maxBytes
+        self.usedBytes = 0
+        self.bitmaps = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.renderTime = 0.0
+
+    def get(self, text, font, size):
+        """Get a bitmap of text, rendering it if it is not cached. size is the
+        size of the zone the text is drawn in."""
+        key = (text, font, size)
+        bitmap = self.bitmaps.get(key)
+        if bitmap is not None:
+            self.hits += 1
+            self.bitmaps.move_to_end(key)
+            return bitmap
+        from PIL import Image, ImageDraw
+
+        self.misses += 1
+        start = time.perf_counter()
+        bitmap = Image.new("1", font.getsize(text))
+        ImageDraw.Draw(bitmap).text((0, 0), text, font=font, fill=255)
+        self.renderTime += time.perf_counter() - start
+        self.bitmaps[key] = bitmap
+        self.usedBytes += self.bitmap_bytes(bitmap)
+        # Evict least recently used bitmaps, but always keep the newest one
+        while self.usedBytes > self.maxBytes and len(self.bitmaps) > 1:
+            _, oldBitmap = self.bitmaps.popitem(last=False)
+            self.usedBytes -= self.bitmap_bytes(oldBitmap)
+        return bitmap
+
+    @staticmethod
+    def bitmap_bytes(bitmap):
+        """Approximate memory used by a cached bitmap"""
+        width, height = bitmap.size
+        return (width + 7) // 8 * height + 200
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        self.bitmaps.clear()
+        self.usedBytes = 0
+
+
+class ZoneTree:
+    """Index of the zones on a display. Holds each zone's ancestors and
+    descendants, and the zones which are currently owned. There is no spatial
+    index or owner lookup: zones only conflict through their ancestry, and
+    with a handful of zones owned at once the arbiter checks them directly."""
+
+    def __init__(self):
+        self.ownedZones = set()
+
+    def add(self, zone):
+        """Add a zone. Its parents must have been added already."""
+        zone.ancestors = set()
+        for parent in zone.parents:
+            zone.ancestors |= {parent} | parent.ancestors
+            parent.children.append(zone)
+        for ancestor in zone.ancestors:
+            ancestor.descendants.add(zone)
+
+    def related(self, zone, other):
+        """Whether other is zone, one of its ancestors or one of its descendants"""
+        return other is zone or other in zone.ancestors or other in zone.descendants
+
+    def claim(self, zone, iD, priority, expiry=None):
+        """Give ownership of a zone"""
+        zone.iD = iD
+        zone.priority = priority
+        zone.expiry = expiry
+        self.ownedZones.add(zone)
+
+    def release(self, zone):
+        """Release ownership of a zone and every zone inside it"""
+        for releasedZone in [zone, *zone.descendants]:
+            releasedZone.priority = 0
+            releasedZone.iD = None
+            releasedZone.expiry = None
+            self.ownedZones.discard(releasedZone)
+
+
+class ZoneArbiter:
+    """Gives ownership of display zones to requests by priority. Lower numbers are
+    higher priority and 0 means unowned. Waiting requests are woken as soon as a
+    zone is released or its ownership expires. A newer request with the same iD
+    for the same zone supersedes one that is still waiting, unless it is only a
+    check which doesn't wait."""
+
+    def __init__(self, zoneTree):
+        self.zoneTree = zoneTree
+        self.changed = None
+        self.waiting = {}
+
+    def blocked_until(self, iD, zone, priority):
+        """When the zone stops being blocked for a request (inf if the blocking
+        owner has no expiry), or None if it is not blocked"""
+        now = time.monotonic()
+        blockedUntil = None
+        for other in self.zoneTree.ownedZones:
+            if other.priority >= priority or other.iD == iD:
+                continue
+            if not self.zoneTree.related(zone, other):
+                continue
+            expiry = math.inf if other.expiry is None else other.expiry
+            if expiry > now:
+                blockedUntil = max(expiry, blockedUntil or expiry)
+        return blockedUntil
+
+    async def acquire(self, iD, zone, priority, timeToWait=3, expiry=None):
+        """Wait up to timeToWait seconds for ownership of zone. Returns True if
+        ownership was given, or False if it timed out or was superseded."""
+        if timeToWait <= 0:
+            # Only a check, which must not supersede a request that is waiting
+            if self.blocked_until(iD, zone, priority) is not None:
+                return False
+            return self.claim(iD, zone, priority, expiry)
+        key = (iD, zone)
+        request = object()
+        self.waiting[key] = request
+        # Wake any older request for the same key so it can give up
+        self.notify()
+        deadline = time.monotonic() + timeToWait
+        try:
+            while True:
+                if self.waiting.get(key) is not request:
+                    logging.info(f"Request for {iD} superseded")
+                    return False
+                blockedUntil = self.blocked_until(iD, zone, priority)
+                if blockedUntil is None:
+                    break
+                now = time.monotonic()
+                if now >= deadline:
+                    logging.info(f"Request for {iD} timed out")
+                    return False
+                await self.wait_for_change(min(deadline, blockedUntil) - now)
+        finally:
+            if self.waiting.get(key) is request:
+                del self.waiting[key]
+        return self.claim(iD, zone, priority, expiry)
+
+    def claim(self, iD, zone, priority, expiry=None):
+        self.zoneTree.claim(
+            zone, iD, priority, None if expiry is None else time.monotonic() + expiry
         )
-        self.width = width
-        self.height = height
-        # Clear display.
-        self.fill(0)
-        self.show()
+        return True
+
+    async def wait_for_change(self, timeout):
+        """Wait until notify() is called or timeout seconds have passed"""
+        if self.changed is None:
+            self.changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def notify(self):
+        """Wake all waiting requests to check their zones again"""
+        if self.changed is not None:
+            self.changed.set()
+            self.changed = None
+
+
+class LCDDisplay:
+    """OLED display driver. Draws on an image and sends the changes to a display
+    backend."""
+
+    def __init__(self, backend, maxFps=20, threaded=True):
+        from PIL import Image, ImageDraw, ImageFont
+
+        self.backend = backend
+        self.width = backend.width
+        self.height = backend.height
+        # Mirror of the display RAM, which backends start with blank
+        self.buffer = bytearray(self.width * backend.pages)
+        # Areas drawn to since the last update as (x0, y0, x1, y1), inclusive
+        self.dirtyAreas = []
+        # Frame scheduling. Flushes are limited to maxFps.
+        self.maxFps = maxFps
+        self.frameTask = None
+        self.frameEvent = None
+        self.framesFlushed = 0
+        # Double buffering. flush() updates the buffer mirror and records the
+        # columns of each page which changed. A worker thread copies them from
+        # the mirror and sends them, so SPI transfers don't block the loop.
+        # Frames flushed while one is being sent are merged and sent together.
+        self.threaded = threaded
+        self.transferThread = None
+        self.transferLock = threading.Condition()
+        self.transferring = False
+        self.pendingPages = {}
+        self.pendingFrames = 0
+        self.framesSent = 0
+        self.droppedFrames = 0
+        self.lastTransferTime = 0.0
+        self.textCache = TextCache()
+        # Default font for text drawn on this display
+        self.font = ImageFont.load_default()
+        self.zoneTree = ZoneTree()
+        self.zoneArbiter = ZoneArbiter(self.zoneTree)
+        # Transfer counters
+        self.bytesSent = 0
+        self.windowsSent = 0
+        # Time spent packing and transferring flushes
+        self.packTime = 0.0
+        self.transferTime = 0.0
+        self.statsStart = time.monotonic()
+        self.statsBytes = 0
         # Create blank image for drawing.
         # Make sure to create image with mode '1' for 1-bit color.
         self.displayImg = Image.new("1", (self.width, self.height))
@@ -34,30 +236,187 @@ class LCDDisplay(adafruit_ssd1305.SSD1305_SPI):
 
     def clear_display(self):
         self.draw.rectangle((0, 0, self.width, self.height), outline=0, fill=0)
-        self.show()
+        self.mark_dirty(0, 0, self.width, self.height)
+        self.update_display()
 
     def println(self, text, textWidth=None, textHeight=None):
         """Standard text display. Local function?????"""
 
         # Load default font.
-        font = ImageFont.load_default()
+        font = self.font
         # font = ImageFont.truetype("Fonts/Retro Gaming.ttf", 8)
 
         self.clear_display()
 
         # Draw Some Text
-        (font_width, font_height) = font.getsize(text)
-        self.draw.text(
-            (self.width // 2 - font_width // 2, self.height // 2 - font_height // 2,),
-            text,
-            font=font,
-            fill=255,
-        )
+        textBitmap = self.textCache.get(text, font, (self.width, self.height))
+        (font_width, font_height) = textBitmap.size
+        textX = self.width // 2 - font_width // 2
+        textY = self.height // 2 - font_height // 2
+        self.displayImg.paste(255, (textX, textY), textBitmap)
         self.update_display()
 
+    def mark_dirty(self, x0, y0, x1, y1):
+        """Record an area of the image that has been drawn to"""
+        x0, y0 = max(int(x0), 0), max(int(y0), 0)
+        x1, y1 = min(int(x1), self.width - 1), min(int(y1), self.height - 1)
+        if x0 <= x1 and y0 <= y1:
+            self.dirtyAreas.append((x0, y0, x1, y1))
+
     def update_display(self):
-        self.image(self.displayImg)
-        self.show()
+        """Request a flush of the dirty areas on the next frame. Changes requested
+        within one frame are merged and sent together."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop running yet (e.g. at start up) so flush straight away
+            self.flush()
+            return
+        if self.frameTask is None or self.frameTask.done():
+            self.frameEvent = asyncio.Event()
+            self.frameTask = loop.create_task(self.run_frames())
+        self.frameEvent.set()
+
+    async def run_frames(self):
+        """Flush pending changes at most maxFps times a second"""
+        while True:
+            await self.frameEvent.wait()
+            self.frameEvent.clear()
+            self.flush()
+            await asyncio.sleep(1 / self.maxFps)
+
+    def flush(self):
+        """Send the changed bytes of any dirty areas to the display"""
+        from DisplayPages import pack_pages
+
+        if not self.dirtyAreas:
+            return
+        self.framesFlushed += 1
+        packStart = time.perf_counter()
+        dirtyAreas, self.dirtyAreas = self.dirtyAreas, []
+        # Merge dirty areas into a column range for each page they touch
+        pageColumns = {}
+        for x0, y0, x1, y1 in dirtyAreas:
+            for page in range(y0 // 8, y1 // 8 + 1):
+                col0, col1 = pageColumns.get(page, (x0, x1))
+                pageColumns[page] = (min(col0, x0), max(col1, x1))
+
+        changedPages = {}
+        # The mirror is only written here, but is read by the transfer thread
+        with self.transferLock:
+            for page, (col0, col1) in sorted(pageColumns.items()):
+                (data,) = pack_pages(self.displayImg, col0, col1, page, page)
+                start = page * self.width
+                sent = self.buffer[start + col0 : start + col1 + 1]
+                if data == sent:
+                    continue
+                # Trim to the bytes which have actually changed
+                first = next(i for i, byte in enumerate(data) if byte != sent[i])
+                last = next(i for i in reversed(range(len(data))) if data[i] != sent[i])
+                col0, col1 = col0 + first, col0 + last
+                self.buffer[start + col0 : start + col1 + 1] = data[first : last + 1]
+                changedPages[page] = (col0, col1)
+        self.packTime += time.perf_counter() - packStart
+        if changedPages:
+            self.queue_frame(changedPages)
+
+    def queue_frame(self, changedPages):
+        """Queue the changed columns of pages to be sent"""
+        with self.transferLock:
+            for page, (col0, col1) in changedPages.items():
+                pending = self.pendingPages.get(page)
+                if pending is not None:
+                    col0, col1 = min(col0, pending[0]), max(col1, pending[1])
+                self.pendingPages[page] = (col0, col1)
+            self.pendingFrames += 1
+            if self.threaded:
+                if self.transferThread is None:
+                    self.transferThread = threading.Thread(
+                        target=self.run_transfers, name="DisplayTransfer", daemon=True
+                    )
+                    self.transferThread.start()
+                self.transferLock.notify_all()
+        if not self.threaded:
+            self.send_frame()
+
+    def run_transfers(self):
+        """Send queued frames on the transfer thread"""
+        while True:
+            with self.transferLock:
+                self.transferLock.wait_for(lambda: self.pendingFrames)
+            try:
+                self.send_frame()
+            except Exception:
+                logging.exception("Display transfer failed")
+
+    def send_frame(self):
+        """Send everything queued since the last frame was sent"""
+        with self.transferLock:
+            if not self.pendingFrames:
+                return
+            self.droppedFrames += self.pendingFrames - 1
+            self.pendingFrames = 0
+            pendingPages, self.pendingPages = self.pendingPages, {}
+            windows = []
+            for page, (col0, col1) in sorted(pendingPages.items()):
+                start = page * self.width
+                data = bytes(self.buffer[start + col0 : start + col1 + 1])
+                windows.append((col0, col1, page, page, data))
+            self.transferring = True
+
+        transferStart = time.perf_counter()
+        try:
+            for window in windows:
+                self.write_window(*window)
+            if windows:
+                self.backend.end_frame()
+        finally:
+            self.lastTransferTime = time.perf_counter() - transferStart
+            self.transferTime += self.lastTransferTime
+            with self.transferLock:
+                self.framesSent += 1
+                self.transferring = False
+                self.transferLock.notify_all()
+
+    def wait_for_transfers(self, timeout=None):
+        """Block until everything queued has been sent. Returns False on timeout."""
+        with self.transferLock:
+            return self.transferLock.wait_for(
+                lambda: not self.pendingFrames and not self.transferring, timeout
+            )
+
+    def write_window(self, col0, col1, page0, page1, data):
+        """Write page/column bytes to a window of the display RAM"""
+        self.backend.write_window(col0, col1, page0, page1, data)
+        self.bytesSent += 6 + len(data)
+        self.windowsSent += 1
+
+    def transfer_stats(self):
+        """Frames sent, frames dropped (merged into a newer frame before they
+        were sent) and the average and last transfer times in seconds"""
+        return {
+            "framesSent": self.framesSent,
+            "droppedFrames": self.droppedFrames,
+            "averageTransferTime": self.transferTime / max(self.framesSent, 1),
+            "lastTransferTime": self.lastTransferTime,
+        }
+
+    def bytes_per_second(self):
+        """Bytes sent to the display per second since the last call"""
+        now = time.monotonic()
+        rate = (self.bytesSent - self.statsBytes) / max(now - self.statsStart, 1e-6)
+        self.statsStart, self.statsBytes = now, self.bytesSent
+        return rate
+
+    def report(self):
+        stats = self.transfer_stats()
+        return (
+            f"Display sent {stats['framesSent']} frames "
+            f"({stats['droppedFrames']} merged) in {self.windowsSent} windows, "
+            f"{self.bytes_per_second():.0f} B/s, "
+            f"{stats['averageTransferTime'] * 1000:.1f} ms per frame, "
+            f"text cache hit rate {self.textCache.hit_rate():.0%}"
+        )
 
 
 class DisplayZone(LCDDisplay):
@@ -72,88 +431,108 @@ class DisplayZone(LCDDisplay):
         self.startPixel = (x, y)
         self.priority = 0
         self.iD = ""
+        self.expiry = None
         self.task = None
+        self.scrollKey = None
+        self.scrollStrip = None
+        # Increased whenever the zone's pixels are wiped
+        self.revision = 0
+        self.parents = [] if parents is None else list(parents)
         self.children = []
-        self.parents = []
-        if parents is not None:
-            for parent in parents:
-                self.parents.append(parent)
-                logging.debug(1)
-                parent.add_child(self)
-
-    def add_child(self, child):
-        self.children.append(child)
-        if self.parents:
-            for parent in self.parents:
-                # logging.debug(2)
-                parent.add_child(child)
+        self.descendants = set()
+        # Sets ancestors and adds this zone to its parents
+        display.zoneTree.add(self)
 
     def clear_display(self, update=True, wipeID=True):
         if wipeID:
-            self.priority = 0
-            self.iD = None
-            for childZone in self.children:
-                childZone.priority = 0
-                childZone.iD = None
+            self.display.zoneTree.release(self)
             self.cancel_task()
+            # Wake anything waiting for these zones
+            self.display.zoneArbiter.notify()
+        for zone in [self, *self.descendants]:
+            zone.revision += 1
         self.display.draw.rectangle(
             (self.x, self.y, self.x + self.width, self.y + self.height),
             outline=0,
             fill=0,
         )
+        self.mark_dirty()
         if update:
             self.update_display()
 
+    def mark_dirty(self, x0=None, y0=None, x1=None, y1=None):
+        """Mark an area of the display as changed. Defaults to the whole zone."""
+        self.display.mark_dirty(
+            self.x if x0 is None else x0,
+            self.y if y0 is None else y0,
+            self.x + self.width if x1 is None else x1,
+            self.y + self.height if y1 is None else y1,
+        )
+
     def update_display(self):
         self.display.update_display()
 
-    def println(self, text, update=True, font=ImageFont.load_default(), offset=0):
+    def println(self, text, update=True, font=None, offset=0):
         """Standard text display. Local function?????"""
 
         # Load default font.
+        if font is None:
+            font = self.display.font
         # font = ImageFont.truetype("Fonts/Retro Gaming.ttf", 8)
 
         self.clear_display(update=False, wipeID=False)
 
-        # Draw Some Text
-        (font_width, font_height) = font.getsize(text)
-        self.display.draw.text(
-            (
-                self.x + (self.width // 2 - font_width // 2) + offset,
-                # self.x + 5,
-                self.y + (self.height // 2 - font_height // 2),
-            ),
-            text,
-            font=font,
-            fill=255,
-            anchor="ms",
-        )
+        # Draw Some Text from a cached bitmap
+        textBitmap = self.display.textCache.get(text, font, (self.width, self.height))
+        (font_width, font_height) = textBitmap.size
+        textX = self.x + (self.width // 2 - font_width // 2) + offset
+        # textX = self.x + 5
+        textY = self.y + (self.height // 2 - font_height // 2)
+        self.display.displayImg.paste(255, (textX, textY), textBitmap)
+        self.mark_dirty(textX, textY, textX + font_width, textY + font_height)
 
         if update:
             self.update_display()
 
-    async def print_scroll(self, text, font=ImageFont.load_default(), scrollSpeed=4):
-        """Scrolling text display."""
-        buffer = 5
+    async def print_scroll(self, text, font=None, scrollSpeed=20):
+        """Scrolling text display. Moves a pre-rendered strip of the text one pixel
+        at a time at scrollSpeed pixels per second. The controller's horizontal
+        scroll isn't used: it only rotates what is already in display RAM, so it
+        can't bring in text wider than the zone."""
+        if font is None:
+            font = self.display.font
 
-        # print text here
-        # font = ImageFont.truetype("Fonts/Retro Gaming.ttf", 8)
-        (font_width, font_height) = font.getsize(text)
-        scrollText = text
-        while font_width >= self.width:
-            scrollText = scrollText[:-1]
-            (font_width, font_height) = font.getsize(scrollText)
-        scrollSize = len(scrollText)
-        noOfScrolls = len(text) - scrollSize + 1
-        doubleText = text + (" " * buffer) + text
+        strip, period = self.scroll_strip(text, font)
+        stripY = self.y + (self.height // 2 - strip.height // 2)
 
         while True:
-            for i in range(noOfScrolls + scrollSize + buffer):
-                scrollText = doubleText[i : (scrollSize + i)]
-                self.println(scrollText, update=False)
+            for offset in range(period):
+                self.clear_display(update=False, wipeID=False)
+                window = strip.crop((offset, 0, offset + self.width, strip.height))
+                self.display.displayImg.paste(255, (self.x, stripY), window)
+                self.mark_dirty(y0=stripY, y1=stripY + strip.height)
                 self.update_display()
                 await asyncio.sleep(1 / scrollSpeed)
 
+    def scroll_strip(self, text, font, gap=5):
+        """Get a strip of repeated text that any scroll position can be cropped from,
+        and its repeat period in pixels. Only rebuilt when the text changes."""
+        from PIL import Image
+
+        key = (text, font, self.width)
+        if self.scrollKey != key:
+            textBitmap = self.display.textCache.get(
+                text, font, (self.width, self.height)
+            )
+            period = textBitmap.width + font.getsize(" " * gap)[0]
+            copies = self.width // period + 2
+            strip = Image.new("1", (period * copies, textBitmap.height))
+            for copy in range(copies):
+                strip.paste(textBitmap, (copy * period, 0))
+            self.scrollKey = key
+            self.scrollStrip = (strip, period)
+        return self.scrollStrip
+
     def print_time(self, timeMS, update=True, hours=False):
         s, ms = divmod(timeMS, 1000)
         m, s = divmod(s, 60)
@@ -165,8 +544,10 @@ class DisplayZone(LCDDisplay):
 
         self.println(timeText, update=update)
 
-    def print_text(self, text, font=ImageFont.load_default()):
+    def print_text(self, text, font=None):
         self.cancel_task()
+        if font is None:
+            font = self.display.font
         # font = ImageFont.truetype("Fonts/Retro Gaming.ttf", 8)
         (font_width, font_height) = font.getsize(text)
         if font_width > self.width:
@@ -175,19 +556,102 @@ class DisplayZone(LCDDisplay):
             self.println(text, font=font)
 
     def cancel_task(self):
-        for zone in [self] + self.children:
-            try:
+        for zone in [self, *self.descendants]:
+            if zone.task is not None:
                 zone.task.cancel()
-            except asyncio.CancelledError:
-                logging.debug(f"Cancel not worked")
-            except:
-                logging.debug(f"Cancel not worked")
+
+
+class ProgressWidget:
+    """Track progress bar between elapsed and total time labels. Remembers what
+    it last drew and only redraws the columns of the bar that change and labels
+    whose displayed seconds change. Everything is redrawn if any of its zones
+    are wiped."""
+
+    def __init__(self, leftZone, barZone, rightZone):
+        self.leftZone = leftZone
+        self.barZone = barZone
+        self.rightZone = rightZone
+        # Bar ends are at barZone.x and barZone.x + lineLength
+        self.lineLength = barZone.width - 2
+        self.lineY = barZone.y + barZone.height // 2
+        self.reset()
+
+    def reset(self):
+        """Forget what was drawn so the next update redraws everything"""
+        self.revisions = None
+        self.filled = None
+        self.shownProgress = None
+        self.shownLength = None
+
+    def update(self, trackProgress, trackLength):
+        """Draw the progress of a track. Returns True if anything was drawn."""
+        zones = (self.leftZone, self.barZone, self.rightZone)
+        if self.revisions != tuple(zone.revision for zone in zones):
+            self.reset()
+        filled = int(trackProgress / trackLength * self.lineLength)
+        filled = min(max(filled, 0), self.lineLength)
+        progressSeconds = trackProgress // 1000
+        lengthSeconds = trackLength // 1000
+
+        # Labels first, as wiping their zones also wipes the bar end next to them
+        repair = []
+        if lengthSeconds != self.shownLength:
+            self.rightZone.print_time(trackLength, update=False)
+            self.shownLength = lengthSeconds
+            repair.append(self.rightZone)
+        if progressSeconds != self.shownProgress:
+            self.leftZone.print_time(trackProgress, update=False)
+            self.shownProgress = progressSeconds
+            repair.append(self.leftZone)
+        changed = bool(repair)
+
+        barX = self.barZone.x
+        shownFilled, self.filled = self.filled, filled
+        if shownFilled is None:
+            self.draw_columns(barX, barX + self.barZone.width)
+            changed = True
+        else:
+            if filled != shownFilled:
+                self.draw_columns(
+                    barX + min(filled, shownFilled), barX + max(filled, shownFilled)
+                )
+                changed = True
+            for zone in repair:
+                self.draw_columns(
+                    max(zone.x, barX),
+                    min(zone.x + zone.width, barX + self.barZone.width),
+                )
+        self.revisions = tuple(zone.revision for zone in zones)
+        return changed
+
+    def draw_columns(self, x0, x1):
+        """Redraw columns x0-x1 (inclusive) of the bar"""
+        if x0 > x1:
+            return
+        zone = self.barZone
+        barX = zone.x
+        draw = zone.display.draw
+        lineY = self.lineY
+        draw.rectangle((x0, zone.y, x1, zone.y + zone.height), outline=0, fill=0)
+        # Filled part of the bar is 3 pixels thick
+        thickEnd = min(x1, barX + self.filled)
+        if max(x0, barX) <= thickEnd:
+            draw.rectangle((max(x0, barX), lineY - 1, thickEnd, lineY + 1), fill=255)
+        thinStart = max(x0, barX + self.filled + 1)
+        thinEnd = min(x1, barX + self.lineLength)
+        if thinStart <= thinEnd:
+            draw.line((thinStart, lineY, thinEnd, lineY), fill=255)
+        # Bar ends
+        for endX in (barX, barX + self.lineLength):
+            if x0 <= endX <= x1:
+                draw.line((endX, lineY - 3, endX, lineY + 3), fill=255)
+        zone.mark_dirty(x0, zone.y, x1, zone.y + zone.height)
 
 
 displayPins = {
-    "cs": digitalio.DigitalInOut(board.D8),
-    "dc": digitalio.DigitalInOut(board.D13),
-    "rs": digitalio.DigitalInOut(board.D26),
+    "cs": "D8",
+    "dc": "D13",
+    "rs": "D26",
 }
 displayWidth = 128
 displayHeight = 32  # Was 64
@@ -213,102 +677,134 @@ class PlayerDisplay:
         "Welcome " + driver,
     ]
 
-    display = LCDDisplay(displayPins, displayWidth, displayHeight)
-    img = display.displayImg
-
-    # Display Zones
-    wholeDisplay = DisplayZone(display, 0, 0, displayWidth, displayHeight)
-    topLeft = DisplayZone(display, 0, 0, cornerWidth, topBarHeight, [wholeDisplay])
-    bluetoothZone = DisplayZone(display, 0, 0, bluetoothWidth, topBarHeight, [topLeft])
-    topCenter = DisplayZone(
-        display,
-        cornerWidth,
-        0,
-        displayWidth - 2 * cornerWidth,
-        topBarHeight,
-        [wholeDisplay],
-    )
-    topRight = DisplayZone(
-        display, displayWidth - 25, 0, cornerWidth, topBarHeight, [wholeDisplay]
-    )
-    mainZone = DisplayZone(  # Everything except top bar
-        display,
-        0,
-        topBarHeight,
-        displayWidth,
-        displayHeight - topBarHeight,
-        [wholeDisplay],
-    )
-    mainTop = DisplayZone(
-        display, 0, topBarHeight, displayWidth, mainTopHeight, [mainZone]
-    )
-    mainBottom = DisplayZone(
-        display,
-        0,
-        topBarHeight + mainTopHeight,
-        displayWidth,
-        displayHeight - mainTopHeight,
-        [mainZone],
-    )
-    trackTimeLeft = DisplayZone(
-        display,
-        trackTimeBorder,
-        topBarHeight + mainTopHeight,
-        trackTimeNumberWidth,
-        displayHeight - mainTopHeight - topBarHeight,
-        [mainBottom],
-    )
-    trackTimeCenter = DisplayZone(
-        display,
-        trackTimeBorder + trackTimeNumberWidth,
-        trackTimeLeft.y,
-        displayWidth - 2 * (trackTimeBorder + trackTimeNumberWidth),
-        trackTimeLeft.height,
-        [mainBottom],
-    )
-    trackTimeRight = DisplayZone(
-        display,
-        displayWidth - (2 * trackTimeBorder + trackTimeNumberWidth),
-        trackTimeLeft.y,
-        trackTimeNumberWidth,
-        trackTimeLeft.height,
-        [mainBottom],
-    )
-
-    def __init__(self, loop):
+    def __init__(self, loop, backend=None):
+        """Nothing is set up until setup() or init() is called, so creating a
+        PlayerDisplay is cheap and doesn't touch the display"""
         self.loop = loop
+        self.backend = backend
+        self.display = None
+        self.setupLock = threading.Lock()
+        self.initFuture = None
+
+    def setup(self):
+        """Open the display, load assets and create the zones. Does nothing if
+        the display has already been set up. Safe to call from any thread."""
+        with self.setupLock:
+            if self.display is not None:
+                return
+            from DisplayBackend import SSD1305Backend
+            from DisplayAssets import AssetBundle
+
+            start = time.perf_counter()
+            backend = self.backend
+            if backend is None:
+                backend = SSD1305Backend(displayPins, displayWidth, displayHeight)
+            display = LCDDisplay(backend)
+            self.img = display.displayImg
+            self.assets = AssetBundle().load()
+            self.create_zones(display)
+            self.backend = backend
+            # Set last, as the display counts as ready once it is set
+            self.display = display
+            logging.info(
+                f"Display set up in {(time.perf_counter() - start) * 1000:.1f} ms"
+            )
 
-    async def check_priority(self, iD, zone, priority, timeToWait=3):
-        """Check if a higher priority function is being shown on the display"""
-        logging.info(f"{zone.iD}, {iD}")
+    def init(self):
+        """Set up the display on a worker thread, so it can overlap other start
+        up work such as BlueZ setup. Can be called any number of times and
+        returns a future to await for the display to be ready."""
+        if self.initFuture is None:
+            self.initFuture = self.loop.run_in_executor(None, self.setup)
+        return self.initFuture
+
+    def ready(self):
+        return self.display is not None
+
+    def create_zones(self, display):
+        self.wholeDisplay = DisplayZone(display, 0, 0, displayWidth, displayHeight)
+        self.topLeft = DisplayZone(
+            display, 0, 0, cornerWidth, topBarHeight, [self.wholeDisplay]
+        )
+        self.bluetoothZone = DisplayZone(
+            display, 0, 0, bluetoothWidth, topBarHeight, [self.topLeft]
+        )
+        self.topCenter = DisplayZone(
+            display,
+            cornerWidth,
+            0,
+            displayWidth - 2 * cornerWidth,
+            topBarHeight,
+            [self.wholeDisplay],
+        )
+        self.topRight = DisplayZone(
+            display,
+            displayWidth - 25,
+            0,
+            cornerWidth,
+            topBarHeight,
+            [self.wholeDisplay],
+        )
+        self.mainZone = DisplayZone(  # Everything except top bar
+            display,
+            0,
+            topBarHeight,
+            displayWidth,
+            displayHeight - topBarHeight,
+            [self.wholeDisplay],
+        )
+        self.mainTop = DisplayZone(
+            display, 0, topBarHeight, displayWidth, mainTopHeight, [self.mainZone]
+        )
+        self.mainBottom = DisplayZone(
+            display,
+            0,
+            topBarHeight + mainTopHeight,
+            displayWidth,
+            displayHeight - mainTopHeight,
+            [self.mainZone],
+        )
+        self.trackTimeLeft = DisplayZone(
+            display,
+            trackTimeBorder,
+            topBarHeight + mainTopHeight,
+            trackTimeNumberWidth,
+            displayHeight - mainTopHeight - topBarHeight,
+            [self.mainBottom],
+        )
+        self.trackTimeCenter = DisplayZone(
+            display,
+            trackTimeBorder + trackTimeNumberWidth,
+            self.trackTimeLeft.y,
+            displayWidth - 2 * (trackTimeBorder + trackTimeNumberWidth),
+            self.trackTimeLeft.height,
+            [self.mainBottom],
+        )
+        self.trackTimeRight = DisplayZone(
+            display,
+            displayWidth - (2 * trackTimeBorder + trackTimeNumberWidth),
+            self.trackTimeLeft.y,
+            trackTimeNumberWidth,
+            self.trackTimeLeft.height,
+            [self.mainBottom],
+        )
+        self.trackProgress = ProgressWidget(
+            self.trackTimeLeft, self.trackTimeCenter, self.trackTimeRight
+        )
 
-        # TODO Need to check higher zones?
-        if zone.iD != iD:
-            attempts = 0
-            minPriority = min(
-                [
-                    childZone.priority
-                    for childZone in zone.children
-                    if childZone.priority != 0
-                ]
-                + [zone.priority]
-            )
-            logging.info(f"{minPriority}")
-            if minPriority != 0:
-                while minPriority < priority:
-                    await asyncio.sleep(0.5)
-                    logging.info(f"priority attempt: {attempts}")
-                    attempts += 1
-                    if attempts > timeToWait / 0.5:
-                        logging.info(f"Returning true")
-                        return True
-            zone.iD = iD
-        # zone.clear_display()  # TODO is this needed?
-        zone.priority = priority
+    async def check_priority(self, iD, zone, priority, timeToWait=3, expiry=None):
+        """Check if a higher priority function is being shown on the display. Waits
+        up to timeToWait seconds for it to finish and returns True if it did not."""
+        logging.info(f"{zone.iD}, {iD}")
+        if not await self.display.zoneArbiter.acquire(
+            iD, zone, priority, timeToWait, expiry
+        ):
+            return True
         logging.info(f"Priority given to {zone.iD}")
         return False
 
     async def welcome(self):
+        await self.init()
         # Show welcome message
         await self.flash_message(
             random.choice(self.welcomeMessage), zone=self.wholeDisplay
@@ -316,27 +812,30 @@ class PlayerDisplay:
 
     async def flash_message(self, text, priority=2, time=3, zone=None):
         """Display a message on the main display zone for a limited time"""
+        await self.init()
         if zone is None:
             zone = self.mainZone
-            # FIXME
-        # if await self.check_priority(text, zone, priority) is False:
-        #     return
+        if await self.check_priority(text, zone, priority, expiry=time):
+            return
         zone.println(text)
         await asyncio.sleep(time)
         zone.clear_display()
 
     def set_bluetooth(self, status):
         """Show or hide the bluetooth icon when a phone is connected/disconnected"""
+        self.setup()
         if status is True:
-            blueImage = Image.open("Images/Bluetooth.png")
-            self.display.img.paste(blueImage, self.bluetoothZone.startPixel)
-            self.display.show()
+            blueImage = self.assets.get("Bluetooth")
+            self.display.displayImg.paste(blueImage, self.bluetoothZone.startPixel)
+            self.bluetoothZone.mark_dirty()
+            self.bluetoothZone.update_display()
         else:
             self.bluetoothZone.clear_display()
 
     async def update_track(self, track):
         """Show or update song information when playing"""
         logging.info(f"updating track info")
+        await self.init()
         task1 = asyncio.create_task(self.check_priority("track", self.topCenter, 3, 3))
         task2 = asyncio.create_task(self.check_priority("track", self.mainZone, 3, 3))
         if await task1 or await task2:
@@ -356,60 +855,16 @@ class PlayerDisplay:
 
     async def update_position(self, trackProgress, trackLength):
         """Show or update song information when playing"""
+        await self.init()
         if self.mainZone.iD != "track" or await self.check_priority(
             "track", self.mainZone, 3, 0
         ):
             return
-        self.trackTimeLeft.print_time(trackProgress, update=False)
-        self.trackTimeRight.print_time(trackLength, update=False)
-        lineLength = self.trackTimeCenter.width - 2
-        progressLength = trackProgress / trackLength * lineLength
-        self.trackTimeCenter.clear_display(update=False, wipeID=False)
-        # Left bar end
-        self.display.draw.line(
-            (
-                self.trackTimeCenter.x,
-                self.trackTimeCenter.y + self.trackTimeCenter.height // 2 - 3,
-                self.trackTimeCenter.x,
-                self.trackTimeCenter.y + self.trackTimeCenter.height // 2 + 3,
-            ),
-            fill=255,
-        )
-        # Left half of progress bar
-        self.display.draw.line(
-            (
-                self.trackTimeCenter.x,
-                self.trackTimeCenter.y + self.trackTimeCenter.height // 2,
-                self.trackTimeCenter.x + progressLength,
-                self.trackTimeCenter.y + self.trackTimeCenter.height // 2,
-            ),
-            fill=255,
-            width=3,
-        )
-        # Right half of progress bar
-        self.display.draw.line(
-            (
-                self.trackTimeCenter.x + progressLength,
-                self.trackTimeCenter.y + self.trackTimeCenter.height // 2,
-                self.trackTimeCenter.x + lineLength,
-                self.trackTimeCenter.y + self.trackTimeCenter.height // 2,
-            ),
-            fill=255,
-        )
-        # Right bar end
-        self.display.draw.line(
-            (
-                self.trackTimeCenter.x + lineLength,
-                self.trackTimeCenter.y + self.trackTimeCenter.height // 2 - 3,
-                self.trackTimeCenter.x + lineLength,
-                self.trackTimeCenter.y + self.trackTimeCenter.height // 2 + 3,
-            ),
-            fill=255,
-        )
-        self.display.update_display()
+        if self.trackProgress.update(trackProgress, trackLength):
+            self.display.update_display()
 
     def clear_track(self):
-        if self.mainZone.iD == "track":
+        if self.ready() and self.mainZone.iD == "track":
             logging.info("Clearing track")
             self.mainZone.clear_display()
             self.topCenter.clear_display()
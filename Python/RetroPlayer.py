@@ -20,7 +20,7 @@ import traceback
 import asyncio
 import asyncio_glib
 
-from BlueHandler import BlueHandler
+from BlueHandler import BlueHandler, TRACK_KEYS
 from PlayerIO import PlayerIO, MultiplexInput, SleepyPi
 from PlayerDisplay import PlayerDisplay
 
@@ -43,6 +43,73 @@ LOG_LEVEL = logging.INFO
 LOG_FILE = None
 LOG_FORMAT = "%(asctime)s %(levelname)s %(message)s"
 logging.basicConfig(level=LOG_LEVEL)
+# Measure event loop stalls. Wakes the loop 20 times a second, so debug only.
+MONITOR_LOOP = LOG_LEVEL <= logging.DEBUG
+
+
+class PlaybackClock:
+    """Local track position clock. Phones send Position rarely (or far too often)
+    so the position is extrapolated from the last real one while playing."""
+
+    def __init__(self):
+        self.position = 0  # ms at timestamp
+        self.timestamp = time.monotonic()
+        self.status = None
+        self.duration = 0
+
+    def playing(self):
+        return self.status == "playing"
+
+    def now(self):
+        """Current position in ms, no further than the end of the track"""
+        position = self.position
+        if self.playing():
+            position += int((time.monotonic() - self.timestamp) * 1000)
+        if self.duration:
+            position = min(position, self.duration)
+        return position
+
+    def sync(self, position):
+        """Resync to a real position"""
+        self.position = position
+        self.timestamp = time.monotonic()
+
+    def set_status(self, status):
+        """Freeze or restart the clock from the current position"""
+        self.sync(self.now())
+        self.status = status
+
+    def set_track(self, duration):
+        self.duration = duration
+        self.sync(0)
+
+
+class LoopMonitor:
+    """Measures how long the event loop is blocked, from how late a regular
+    wake up runs. While the loop is blocked the display and input stall."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.wakeups = 0
+        self.blockedTime = 0.0
+        self.maxBlocked = 0.0
+
+    async def run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            late = time.perf_counter() - start - self.interval
+            self.wakeups += 1
+            if late > 0:
+                self.blockedTime += late
+                self.maxBlocked = max(self.maxBlocked, late)
+
+    def report(self):
+        return (
+            f"Event loop blocked for {self.blockedTime * 1000:.0f} ms in total, "
+            f"at most {self.maxBlocked * 1000:.1f} ms at once, "
+            f"over {self.wakeups} wake ups"
+        )
 
 
 class MediaPlayer(dbus.service.Object):
@@ -77,6 +144,10 @@ class MediaPlayer(dbus.service.Object):
     discoverable = None
     track = {}
     duration = 0
+    clock = None
+    clockTask = None
+    clockRate = 4  # Display updates per second while playing
+    loopMonitor = None
 
     def __init__(self, inPins, outPins):
         self.serialMappingIn = {
@@ -89,6 +160,9 @@ class MediaPlayer(dbus.service.Object):
         }
         self.inPins = inPins
         self.outPins = outPins
+        self.clock = PlaybackClock()
+        if MONITOR_LOOP:
+            self.loopMonitor = LoopMonitor()
 
         # Allows asyncio to use dbus event loop
         asyncio.set_event_loop_policy(asyncio_glib.GLibEventLoopPolicy())
@@ -96,6 +170,9 @@ class MediaPlayer(dbus.service.Object):
         dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
         bus = dbus.SystemBus()
 
+        # Set up the display on a worker thread while BlueZ is set up
+        self.display = PlayerDisplay(self.mainLoop)
+        self.display.init()
         self.blueHandler = BlueHandler(
             bus, self.mainLoop, self.player_handler, "DisplayYesNo"
         )
@@ -105,7 +182,6 @@ class MediaPlayer(dbus.service.Object):
             self.serialMappingIn,
             serialDataOut={"out": [0, 0, 0], "awake": 1, "hand": 1, "alive": 0},
         )
-        self.display = PlayerDisplay(self.mainLoop)
 
         # Add signal handler to exit on keyoard press
         for signame in ("SIGINT", "SIGTERM"):
@@ -125,6 +201,8 @@ class MediaPlayer(dbus.service.Object):
     def start(self):
         """Start the player by beginning GPIO and the gobject/asyncio mainloop()"""
         self.playerio.setup()
+        if self.loopMonitor is not None:
+            self.mainLoop.create_task(self.loopMonitor.run())
         for multiplexer in self.multiplexers:
             self.mainLoop.create_task(multiplexer.setup())
         self.mainLoop.create_task(self.arduino.setup())
@@ -151,6 +229,7 @@ class MediaPlayer(dbus.service.Object):
         if stateName == "State":
             return
         if stateName == "Track":
+            newTrack = any(value.get(key) != self.track.get(key) for key in TRACK_KEYS)
             for trackAttribute in value:
                 # self.track[str(trackAttribute)] = str(
                 #     bytes(value[trackAttribute]), errors="ignore"
@@ -161,23 +240,31 @@ class MediaPlayer(dbus.service.Object):
                     value["Duration"]
                 )  # TODO check if ints and str needed
                 logging.info(f"Duration = {self.duration}")
+            if newTrack:
+                # Position restarts from 0 unless the phone says otherwise
+                self.clock.set_track(self.duration)
             logging.info(self.track)
             if self.display:
                 # asyncio.run_coroutine_threadsafe(
                 #     self.display.update_track(self.track), self.mainLoop
                 # )
-                asyncio.create_task(self.display.update_track(self.track))
+                self.mainLoop.create_task(self.display.update_track(self.track))
         if stateName == "Position":
             self.position = int(value)
-            if self.duration:
-                if self.position > self.duration:
-                    logging.error("Track position exceeds total duration")
-                else:
-                    logging.info(f"Updating position")
-                    asyncio.create_task(
-                        self.display.update_position(self.position, self.duration)
-                    )
+            if self.duration and self.position > self.duration:
+                logging.error("Track position exceeds total duration")
+            self.clock.sync(self.position)
+            if not self.clock.playing():
+                # Not ticking, so show e.g. a seek while paused straight away
+                self.show_position()
         if stateName == "Status":
+            self.clock.set_status(value)
+            if self.clock.playing():
+                if self.clockTask is None or self.clockTask.done():
+                    self.clockTask = self.mainLoop.create_task(self.run_clock())
+            elif self.clockTask is not None:
+                self.clockTask.cancel()
+                self.clockTask = None
             if value == "paused":
                 if self.display:
                     self.display.clear_track()
@@ -191,6 +278,20 @@ class MediaPlayer(dbus.service.Object):
             suffix = "True." if value is True else "False"
             self.mainLoop.create_task(self.display.flash_message("Alias " + suffix))
 
+    def show_position(self):
+        """Show the playback clock's position on the display"""
+        if self.display and self.duration:
+            self.mainLoop.create_task(
+                self.display.update_position(self.clock.now(), self.duration)
+            )
+
+    async def run_clock(self):
+        """Tick the displayed position at clockRate while playing. The display
+        only redraws what has visibly changed."""
+        while True:
+            self.show_position()
+            await asyncio.sleep(1 / self.clockRate)
+
     def update_display(self):
         """Display the current status of the device on the LCD"""
         logging.debug(
@@ -251,10 +352,15 @@ class MediaPlayer(dbus.service.Object):
         logging.info(f"Number {number} button pressed")
         if number == 6:
             logging.info("6")
-            self.blueHandler.set_discoverable()
+            self.mainLoop.create_task(self.blueHandler.set_discoverable())
 
     async def shutdown(self, sigName):
         logging.info(f"Shutting down MediaPlayer. {sigName} was signalled")
+        if self.loopMonitor is not None:
+            logging.info(self.loopMonitor.report())
+        if self.display.display is not None:
+            logging.info(self.display.display.report())
+        logging.info(self.blueHandler.report())
         # self.lcd.end()
 
         self.mainLoop.stop()
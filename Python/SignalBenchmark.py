@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+"""Micro-benchmark of handling BlueZ PropertiesChanged signals.
+
+Replays a typical stream of org.bluez property changes during playback through
+the original catch-all signal handler, which received every one of them, and
+through BlueHandler's per-interface dispatch, which only receives the
+interfaces it subscribes to. Reports wakeups and CPU time for the stream.
+"""
+
+import asyncio
+import logging
+import timeit
+
+import dbus
+
+from BlueHandler import (
+    ADAPTER_IFACE,
+    DEVICE_IFACE,
+    PLAYER_IFACE,
+    SERVICE_NAME,
+    TRACK_KEYS,
+    TRANSPORT_IFACE,
+    BlueHandler,
+    ObjectTree,
+    dbus_decode,
+)
+
+REPEATS = 200
+DEVICE_PATH = "/org/bluez/hci0/dev_00_11_22_33_44_55"
+PLAYER_PATH = DEVICE_PATH + "/player0"
+TRANSPORT_PATH = DEVICE_PATH + "/fd0"
+BATTERY_IFACE = SERVICE_NAME + ".Battery1"
+
+
+def signal(interface, path, **changed):
+    return (interface, dbus.Dictionary(changed, signature="sv"), [], path)
+
+
+# A minute of playback: a track change, position updates and the device and
+# adapter chatter which arrives alongside them
+SIGNALS = (
+    [
+        signal(
+            PLAYER_IFACE,
+            PLAYER_PATH,
+            Track=dbus.Dictionary(
+                {
+                    "Title": dbus.String("Midnight City"),
+                    "Artist": dbus.String("M83"),
+                    "Album": dbus.String("Hurry Up, We're Dreaming"),
+                    "Duration": dbus.UInt32(243960),
+                },
+                signature="sv",
+            ),
+        ),
+        signal(PLAYER_IFACE, PLAYER_PATH, Status=dbus.String("playing")),
+        signal(TRANSPORT_IFACE, TRANSPORT_PATH, State=dbus.String("active")),
+    ]
+    + [
+        signal(PLAYER_IFACE, PLAYER_PATH, Position=dbus.UInt32(second * 1000))
+        for second in range(60)
+    ]
+    + [
+        signal(DEVICE_IFACE, DEVICE_PATH, RSSI=dbus.Int16(-60 - tick % 5))
+        for tick in range(30)
+    ]
+    + [signal(BATTERY_IFACE, DEVICE_PATH, Percentage=dbus.Byte(80))] * 2
+    + [signal(TRANSPORT_IFACE, TRANSPORT_PATH, Volume=dbus.UInt16(90))] * 4
+    + [signal(ADAPTER_IFACE, "/org/bluez/hci0", Discovering=dbus.Boolean(False))]
+)
+
+
+def legacy_signal_handler(self, interface, changed, invalidated, path):
+    """The original signal_handler, but decoding tracks with TRACK_KEYS as the
+    current handlers do, so only the dispatch differs between the two"""
+    logging.debug(f"Interface [{interface}] changed [{changed}] on path [{path}]")
+    iface = interface[interface.rfind(".") + 1 :]
+    if "Connected" in changed:
+        self.connected = changed["Connected"]
+        if changed["Connected"] == False:
+            if self.connecting == False:
+                asyncio.ensure_future(self.connect_devices(), loop=self.mainLoop)
+        if iface == "MediaControl1":
+            self.find_player()
+            self.update_player(
+                "Connected", dbus_decode([self.connected, self.deviceAlias])
+            )
+    if "State" in changed:
+        self.state = changed["State"]
+        self.update_player("State", dbus_decode(self.state))
+    if "Track" in changed:
+        self.track = changed["Track"]
+        self.update_player("Track", dbus_decode(self.track, TRACK_KEYS))
+    if "Status" in changed:
+        self.status = changed["Status"]
+        self.update_player("Status", dbus_decode(self.status))
+    if "Position" in changed:
+        self.position = changed["Position"]
+        self.update_player("Position", dbus_decode(self.position))
+    if "Discoverable" in changed:
+        self.discoverable = changed["Discoverable"]
+        self.update_player("Discoverable", dbus_decode(self.discoverable))
+
+
+def offline_handler():
+    """A BlueHandler which isn't connected to the bus"""
+    handler = BlueHandler.__new__(BlueHandler)
+    handler.objectTree = ObjectTree()
+    handler.update_player = lambda name, value: None
+    handler.connecting = True
+    handler.disconnecting = set()
+    handler.propertyHandlers = handler.property_handlers()
+    handler.signalStats = {}
+    return handler
+
+
+def main():
+    handler = offline_handler()
+    subscribed = [args for args in SIGNALS if args[0] in handler.propertyHandlers]
+
+    def legacy():
+        for args in SIGNALS:
+            legacy_signal_handler(handler, *args)
+
+    def dispatch():
+        for args in subscribed:
+            handler.signal_handler(*args)
+
+    legacyTime = timeit.timeit(legacy, number=REPEATS) / REPEATS
+    dispatchTime = timeit.timeit(dispatch, number=REPEATS) / REPEATS
+    print(f"{'handler':<10}{'wakeups':>9}{'us/stream':>11}{'us/wakeup':>11}")
+    for name, wakeups, seconds in (
+        ("legacy", len(SIGNALS), legacyTime),
+        ("dispatch", len(subscribed), dispatchTime),
+    ):
+        print(
+            f"{name:<10}{wakeups:>9}{seconds * 1e6:>11.1f}"
+            f"{seconds / wakeups * 1e6:>11.2f}"
+        )
+    for interface, stats in handler.signal_stats().items():
+        print(f"{interface:<28}{stats['usPerSignal']:>8.2f} us/signal")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 # coding=utf-8
 from __future__ import division
 import logging
+import os
+import sys
 import time
 
 # import I2C
@@ -9,10 +11,15 @@ import time
 import Adafruit_GPIO.SPI as SPI
 import Adafruit_GPIO as GPIO
 
+# Page packing is shared with the player, whose modules are in Python/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Python"))
+from DisplayPages import pack_pages  # noqa: E402
+
 # import GPIO
 
 # Constants
 SSD1305_I2C_ADDRESS = 0x3C  # 011110+SA0+RW - 0x3C or 0x3D
+SSD1305_I2C_BLOCK_SIZE = 32  # SMBus block write limit
 SSD1305_SETCONTRAST = 0x81
 SSD1305_DISPLAYALLON_RESUME = 0xA4
 SSD1305_DISPLAYALLON = 0xA5
@@ -75,7 +82,7 @@ class SSD1305Base(object):
         self.width = width
         self.height = height
         self._pages = 4
-        self._buffer = [0] * (width * self._pages)
+        self._buffer = bytearray(width * self._pages)
         # Default to platform GPIO if not provided.
         self._gpio = gpio
         if self._gpio is None:
@@ -117,25 +124,41 @@ class SSD1305Base(object):
 
     def command(self, c):
         """Send self.command byte to display."""
+        self.command_list([c])
+
+    def command_list(self, cmds):
+        """Send a sequence of command bytes to display in one transaction."""
         if self._spi is not None:
             # SPI write.
             self._gpio.set_low(self._dc)
-            self._spi.write([c])
+            self._spi.write(list(cmds))
         else:
             # I2C write.
             control = 0x00  # Co = 0, DC = 0
-            self._i2c.write8(control, c)
+            self._i2c_write(control, cmds)
 
     def data(self, c):
         """Send byte of data to display."""
+        self.data_list([c])
+
+    def data_list(self, buf):
+        """Send a block of data bytes to display in one transaction."""
         if self._spi is not None:
             # SPI write.
             self._gpio.set_high(self._dc)
-            self._spi.write([c])
+            self._spi.write(list(buf))
         else:
             # I2C write.
-            control = 0x40  # Co = 0, DC = 0
-            self._i2c.write8(control, c)
+            control = 0x40  # Co = 0, DC = 1
+            self._i2c_write(control, buf)
+
+    def _i2c_write(self, control, buf):
+        """Write bytes after a control byte using block writes no longer than the
+        SMBus limit."""
+        for start in range(0, len(buf), SSD1305_I2C_BLOCK_SIZE):
+            self._i2c.writeList(
+                control, list(buf[start : start + SSD1305_I2C_BLOCK_SIZE])
+            )
 
     def begin(self, vccstate=SSD1305_SWITCHCAPVCC):
         """Initialize display."""
@@ -161,15 +184,10 @@ class SSD1305Base(object):
         self._gpio.set_high(self._rst)
 
     def display(self):
-        # """Write display buffer to physical display."""
-        for page in range(0, 4):
-            self.command(0xB0 + page)
-            self.command(0x04)
-            self.command(0x10)
-            self._gpio.set_high(self._dc)
-            for num in range(0, 128):
-                self._spi.write([self._buffer[page * 128 + num]])
-        #         pass
+        """Write display buffer to physical display, one transfer per page."""
+        for page in range(self._pages):
+            self.command_list([0xB0 + page, 0x04, 0x10])
+            self.data_list(self._buffer[page * self.width : (page + 1) * self.width])
 
     def image(self, image):
         """Set buffer to value of Python Imaging Library image.  The image should
@@ -184,34 +202,19 @@ class SSD1305Base(object):
                     self.width, self.height
                 )
             )
-        # Grab all the pixels from the image, faster than getpixel.
-        pix = image.load()
-        # Iterate through the memory pages
-        index = 0
-        for page in range(self._pages):
-            # Iterate through all x axis columns.
-            for x in range(self.width):
-                # Set the bits for the column of pixels at the current position.
-                bits = 0
-                # Don't use range here as it's a bit slow
-                for bit in [0, 1, 2, 3, 4, 5, 6, 7]:
-                    bits = bits << 1
-                    bits |= 0 if pix[(x, page * 8 + 7 - bit)] == 0 else 1
-                # Update buffer byte and increment to next byte.
-                self._buffer[index] = bits
-                index += 1
+        # Pack the whole image in one pass into the existing buffer.
+        pack_pages(image, 0, self.width - 1, 0, self._pages - 1, self._buffer)
 
     def clear(self):
         """Clear contents of image buffer."""
-        self._buffer = [0] * (self.width * self._pages)
+        self._buffer[:] = bytes(len(self._buffer))
 
     def set_contrast(self, contrast):
         """Sets the contrast of the display.  Contrast should be a value between
         0 and 255."""
         if contrast < 0 or contrast > 255:
             raise ValueError("Contrast must be a value from 0 to 255 (inclusive).")
-        self.self.command(SSD1305_SETCONTRAST)
-        self.self.command(contrast)
+        self.command_list([SSD1305_SETCONTRAST, contrast])
 
     def dim(self, dim):
         """Adjusts contrast to dim the display if dim is True, otherwise sets the
@@ -248,29 +251,31 @@ class SSD1305_128_32(SSD1305Base):
 
     def _initialize(self):
         # 128x32 pixel specific initialization.
-        self.command(0xAE)  # --turn off oled panel
-        self.command(0x04)  # --turn off oled panel
-        self.command(0x10)  # --turn off oled panel
-        self.command(0x40)  # ---set low column address
-        self.command(0x81)  # ---set high column address
-        self.command(
-            0x80
-        )  # --set start line address  Set Mapping RAM Display Start Line (0x00~0x3F)
-        self.command(0xA1)  # --set contrast control register
-        self.command(0xA6)  # Set SEG Output Current Brightness
-        self.command(0xA8)  # --Set SEG/Column Mapping     0xa0×óÓÒ·´ÖÃ 0xa1Õý³£
-        self.command(0x1F)  # Set COM/Row Scan Direction   0xc0ÉÏÏÂ·´ÖÃ 0xc8Õý³£
-        self.command(0xC8)  # --set normal display
-        self.command(0xD3)  # --set multiplex ratio(1 to 64)
-        self.command(0x00)  # --1/64 duty
-        self.command(0xD5)  # -set display offset	Shift Mapping RAM Counter (0x00~0x3F)
-        self.command(0xF0)  # -not offset
-        self.command(0xD8)  # --set display clock divide ratio/oscillator frequency
-        self.command(0x05)  # --set divide ratio, Set Clock as 100 Frames/Sec
-        self.command(0xD9)  # --set pre-charge period
-        self.command(0xC2)  # Set Pre-Charge as 15 Clocks & Discharge as 1 Clock
-        self.command(0xDA)  # --set com pins hardware configuration
-        self.command(0x12)
-        self.command(0xDB)  # --set vcomh
-        self.command(0x08)  # Set VCOM Deselect Level
-        self.command(0xAF)  # -Set Page Addressing Mode (0x00/0x01/0x02)
+        self.command_list(
+            [
+                0xAE,  # --turn off oled panel
+                0x04,  # --turn off oled panel
+                0x10,  # --turn off oled panel
+                0x40,  # ---set low column address
+                0x81,  # ---set high column address
+                0x80,  # --set start line address  Set Mapping RAM Display Start Line (0x00~0x3F)
+                0xA1,  # --set contrast control register
+                0xA6,  # Set SEG Output Current Brightness
+                0xA8,  # --Set SEG/Column Mapping     0xa0×óÓÒ·´ÖÃ 0xa1Õý³£
+                0x1F,  # Set COM/Row Scan Direction   0xc0ÉÏÏÂ·´ÖÃ 0xc8Õý³£
+                0xC8,  # --set normal display
+                0xD3,  # --set multiplex ratio(1 to 64)
+                0x00,  # --1/64 duty
+                0xD5,  # -set display offset	Shift Mapping RAM Counter (0x00~0x3F)
+                0xF0,  # -not offset
+                0xD8,  # --set display clock divide ratio/oscillator frequency
+                0x05,  # --set divide ratio, Set Clock as 100 Frames/Sec
+                0xD9,  # --set pre-charge period
+                0xC2,  # Set Pre-Charge as 15 Clocks & Discharge as 1 Clock
+                0xDA,  # --set com pins hardware configuration
+                0x12,
+                0xDB,  # --set vcomh
+                0x08,  # Set VCOM Deselect Level
+                0xAF,  # -Set Page Addressing Mode (0x00/0x01/0x02)
+            ]
+        )
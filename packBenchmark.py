@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of SSD1305 page packing.
+
+Compares the original per-pixel loop against DisplayPages.pack_pages on a
+busy 128x32 frame and checks that both produce the same bytes.
+"""
+
+import os
+import random
+import sys
+import timeit
+
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Python"))
+from DisplayPages import pack_pages  # noqa: E402
+
+WIDTH = 128
+HEIGHT = 32
+PAGES = HEIGHT // 8
+REPEATS = 200
+
+
+def pack_loop(image, pages, buffer):
+    """The original SSD1305Base.image() packing loop"""
+    pix = image.load()
+    index = 0
+    for page in range(pages):
+        for x in range(image.size[0]):
+            bits = 0
+            for bit in [0, 1, 2, 3, 4, 5, 6, 7]:
+                bits = bits << 1
+                bits |= 0 if pix[(x, page * 8 + 7 - bit)] == 0 else 1
+            buffer[index] = bits
+            index += 1
+    return buffer
+
+
+def test_image():
+    image = Image.new("1", (WIDTH, HEIGHT))
+    draw = ImageDraw.Draw(image)
+    draw.text((2, 0), "Artist - Album", font=ImageFont.load_default(), fill=255)
+    draw.line((40, 26, 88, 26), fill=255, width=3)
+    random.seed(1)
+    for _ in range(200):
+        draw.point((random.randrange(WIDTH), random.randrange(HEIGHT)), fill=255)
+    return image
+
+
+image = test_image()
+loopBuffer = pack_loop(image, PAGES, [0] * (WIDTH * PAGES))
+packedBuffer = bytearray(WIDTH * PAGES)
+pack_pages(image, 0, WIDTH - 1, 0, PAGES - 1, packedBuffer)
+assert bytes(loopBuffer) == bytes(packedBuffer), "Packing mismatch"
+
+loopTime = timeit.timeit(lambda: pack_loop(image, PAGES, loopBuffer), number=REPEATS)
+packTime = timeit.timeit(
+    lambda: pack_pages(image, 0, WIDTH - 1, 0, PAGES - 1, packedBuffer),
+    number=REPEATS,
+)
+print(f"Loop:       {loopTime / REPEATS * 1e6:9.1f} us/frame")
+print(f"pack_pages: {packTime / REPEATS * 1e6:9.1f} us/frame")
+print(f"Speedup:    {loopTime / packTime:9.1f}x")